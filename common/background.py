@@ -0,0 +1,131 @@
+import threading
+import time
+
+from solver.grid import Cancelled
+from solver.stats import Stats
+
+class BackgroundSolver:
+    # Runs update_superpositions on a clone of the grid in a thread so the window keeps drawing.
+    # The main loop calls poll() every frame to pick up progress, and edits to the grid restart the solve
+    def __init__(self, grid, rate=20, solve=None):
+        self.grid = grid
+        self.solve = solve or (lambda grid: grid.update_superpositions()) # Engine run on the clone
+        self.interval = 1 / rate # Seconds between two progress pushes
+        self.lock = threading.Lock()
+        self.thread = None
+        self.cancel_event = None
+        self.started_from = None # Snapshot of the grid as the solve last saw it, anything else is a user edit
+        self.published = None # Latest state masks from the worker, not applied to the grid yet
+        self.done = False
+        self.work_stats = None # Stats of the solve in progress, added to the grid's when it finishes
+        self.message = ''
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def start(self):
+        if self.running:
+            return # Pressing Solve again doesn't queue up another solve
+        self.restart()
+
+    def restart(self):
+        self.stop()
+
+        # The worker gets its own Stats: a cancelled thread still winding down can't touch the hooks of the new one
+        work = self.grid.clone()
+        work.stats = self.work_stats = Stats()
+        self.cancel_event = threading.Event()
+        work.cancel = self.cancel_event.is_set
+        self.started_from = self.grid.snapshot()
+        self.published = None
+        self.done = False
+        self.message = ''
+
+        self.thread = threading.Thread(target=self.run, args=(work, self.cancel_event), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.thread = None
+
+    def cancel(self):
+        if self.running:
+            self.stop()
+            self.message = 'Cancelled'
+
+    def nodes(self):
+        return self.work_stats.probes + self.work_stats.branches if self.work_stats is not None else 0
+
+    def run(self, work, cancel_event):
+        # Only states outside of any probe are real deductions, so the grid is only published when no probe is open
+        depth = 0
+        last_push = time.perf_counter()
+
+        # Clones made by the solve share the Stats of work, only the events of work itself track the probe depth
+        def on_branch(grid, x, y, state):
+            nonlocal depth, last_push
+            if grid is not work:
+                return
+            if depth == 0 and time.perf_counter() - last_push >= self.interval:
+                last_push = time.perf_counter()
+                self.publish(cancel_event, grid.state_masks(), False)
+            depth += 1
+
+        def on_backtrack(grid, x, y, state, contradiction):
+            nonlocal depth
+            if grid is work:
+                depth -= 1
+
+        stats = work.stats
+        stats.subscribe('branch', on_branch)
+        stats.subscribe('backtrack', on_backtrack)
+        try:
+            self.solve(work)
+        except Cancelled:
+            return
+        finally:
+            stats.unsubscribe('branch', on_branch)
+            stats.unsubscribe('backtrack', on_backtrack)
+
+        self.publish(cancel_event, work.state_masks(), True)
+
+    def publish(self, cancel_event, masks, done):
+        with self.lock:
+            if cancel_event is self.cancel_event:
+                self.published = masks
+                self.done = done
+
+    def poll(self):
+        if not self.running:
+            return
+
+        if self.grid.snapshot() != self.started_from:
+            self.restart() # The grid was edited while solving
+            return
+
+        with self.lock:
+            masks, done = self.published, self.done
+            self.published = None
+
+        if masks is not None:
+            self.grid.set_state_masks(masks)
+            self.started_from = self.grid.snapshot()
+
+        if done:
+            self.thread = None
+            self.grid.stats.merge(self.work_stats)
+            self.message = 'Contradiction' if self.grid.has_contradiction() else 'Done'
+
+    def fixed_cells(self):
+        return sum(1 for x, y in self.grid.iter_cell_coords() if len(self.grid.cells[x][y].states) == 1)
+
+    def lines(self):
+        # Progress text for a TextPanel
+        fixed = f'{self.fixed_cells()}/{self.grid.width * self.grid.height} cells fixed'
+        if self.running:
+            return [f'Solving: {self.nodes()} nodes, {fixed}']
+        if self.message:
+            return [f'{self.message}: {fixed}']
+        return []
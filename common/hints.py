@@ -0,0 +1,72 @@
+import time
+
+class HintPlayer:
+    # Hint applies the next deduction of Grid.deductions() and says what made it, Replay starts again from the givens
+    # and plays the deductions back one at a time. Deductions are made on a clone and copied over one by one,
+    # since a grid-wide rule can make several at once
+    def __init__(self, grid, live, interval=0.15):
+        self.grid = grid
+        self.live = live
+        self.interval = interval # Seconds between two replayed deductions
+        self.replaying = None # Deductions of the replay in progress
+        self.last_step = 0
+        self.left = None # Snapshot of the grid after the last step, anything else is a user edit
+        self.last = None # Last deduction shown, highlighted by the view
+        self.message = ''
+
+    @property
+    def running(self):
+        return self.replaying is not None
+
+    def hint(self):
+        self.stop()
+        self.show(next(self.grid.clone().deductions(), None))
+
+    def replay(self):
+        self.stop()
+        self.live.restore_givens()
+        self.replaying = self.grid.clone().deductions()
+        self.last_step = 0
+        self.show(None)
+        self.message = 'Replaying'
+
+    def stop(self):
+        if self.replaying is not None:
+            self.replaying.close()
+            self.replaying = None
+
+    def show(self, deduction):
+        self.last = deduction
+        if deduction is not None:
+            kept = [state for state in self.grid.cells[deduction.x][deduction.y].states if state not in deduction.removed]
+            self.grid.set_states(deduction.x, deduction.y, kept)
+            self.message = f'Hint: {deduction}'
+        elif self.grid.has_contradiction():
+            self.message = 'Contradiction'
+        else:
+            self.message = 'Solved' if self.grid.is_solved() else 'No more deductions'
+        self.left = self.grid.snapshot()
+
+    def poll(self):
+        # Called every frame: plays the next step of a replay, and forgets the hint once the grid is edited
+        if self.last is None and self.replaying is None:
+            return
+
+        if self.grid.snapshot() != self.left:
+            self.stop()
+            self.last = None
+            self.message = ''
+            return
+
+        if self.replaying is not None and time.perf_counter() - self.last_step >= self.interval:
+            self.last_step = time.perf_counter()
+            deduction = next(self.replaying, None)
+            if deduction is None:
+                self.stop()
+            self.show(deduction)
+
+    def highlight(self):
+        return (self.last.x, self.last.y) if self.last is not None else None
+
+    def lines(self):
+        return [self.message] if self.message else []
@@ -10,12 +10,24 @@ class Symbol:
 class ImageSymbol:
     def __init__(self, image):
         self.image = image
+        self.surfaces = {} # Cell size -> image converted to the display format and scaled to fit the cell
+
+    def surface(self, cell_size):
+        surface = self.surfaces.get(cell_size)
+        if surface is None:
+            # Converting needs a display mode, so it happens on the first draw instead of at import
+            size = cell_size - 16
+            surface = self.image.convert_alpha()
+            if surface.get_size() != (size, size):
+                surface = pygame.transform.smoothscale(surface, (size, size))
+            self.surfaces[cell_size] = surface
+        return surface
 
     def draw(self, screen, x, y, cell_size):
         if self.image is None:
             return
 
-        screen.blit(self.image, (x + 8, y + 8))
+        screen.blit(self.surface(cell_size), (x + 8, y + 8))
 
 # CROWN = Symbol()
 # MOON = Symbol()
@@ -24,4 +36,15 @@ class ImageSymbol:
 CROWN = ImageSymbol(pygame.image.load("assets/crown.png"))
 MOON = ImageSymbol(pygame.image.load("assets/moon.png"))
 SUN = ImageSymbol(pygame.image.load("assets/sun.png"))
-EMPTY = ImageSymbol(None)
\ No newline at end of file
+EMPTY = ImageSymbol(None)
+
+# Solver states only carry a name, the symbol used to draw them is looked up here
+STATE_SYMBOLS = {
+    'QUEEN': CROWN,
+    'EMPTY': EMPTY,
+    'SUN': SUN,
+    'MOON': MOON,
+}
+
+def for_state(state):
+    return STATE_SYMBOLS.get(state.name, EMPTY)
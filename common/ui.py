@@ -8,18 +8,67 @@ class Button:
         self.hover_color = (min(255, bg_color[0] + 50), min(255, bg_color[1] + 50), min(255, bg_color[2] + 50))
         self.text_color = (255, 255, 255)
         self.action = action
+        self.label = None # Text rendered once, on the first draw
+        self.drawn_hovered = None
 
     def draw(self, screen, font, mouse_pos):
+        # Returns the button rect if it had to be drawn again, None if it still looks the same
         hovered = self.rect.collidepoint(mouse_pos)
+        if hovered == self.drawn_hovered:
+            return None
+        self.drawn_hovered = hovered
+
+        if self.label is None:
+            self.label = font.render(self.text, True, self.text_color)
         pygame.draw.rect(screen, self.hover_color if hovered else self.bg_color, self.rect)
-        text = font.render(self.text, True, self.text_color)
-        text_rect = text.get_rect(center=self.rect.center)
-        screen.blit(text, text_rect)
+        screen.blit(self.label, self.label.get_rect(center=self.rect.center))
+        return self.rect
+
+    def invalidate(self):
+        self.drawn_hovered = None
+
+    def set_text(self, text):
+        self.text = text
+        self.label = None
+        self.invalidate()
     
     def on_click(self, mouse_pos):
         if self.rect.collidepoint(mouse_pos):
             self.action()
 
+class TextPanel:
+    # Small text lines from source.lines(), e.g. solver stats or solve progress. A list of sources shows their lines one after the other
+    def __init__(self, x, y, height, source, visible=True, bg_color=(30, 30, 30)):
+        self.rect = pygame.Rect(x, y, 280, height)
+        self.sources = source if isinstance(source, list) else [source]
+        self.visible = visible
+        self.font = pygame.font.Font(None, 20)
+        self.text_color = (200, 200, 200)
+        self.bg_color = bg_color
+        self.drawn_lines = None
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def invalidate(self):
+        self.drawn_lines = None
+
+    def draw(self, screen):
+        # Returns the panel rect if the text changed since the last draw, None otherwise
+        lines = [line for source in self.sources for line in source.lines()] if self.visible else []
+        if lines == self.drawn_lines:
+            return None
+        self.drawn_lines = lines
+
+        pygame.draw.rect(screen, self.bg_color, self.rect)
+        y = self.rect.y
+        for line in lines:
+            if y + self.font.get_linesize() > self.rect.bottom:
+                break
+            screen.blit(self.font.render(line, True, self.text_color), (self.rect.x, y))
+            y += self.font.get_linesize()
+        return self.rect
+
 class UI:
     def __init__(self):
         self.buttons = []
@@ -29,8 +78,17 @@ class UI:
         self.buttons.append(button)
 
     def draw(self, screen, mouse_pos):
+        # Rects of the buttons that were drawn again
+        dirty = []
+        for button in self.buttons:
+            rect = button.draw(screen, self.font, mouse_pos)
+            if rect is not None:
+                dirty.append(rect)
+        return dirty
+
+    def invalidate(self):
         for button in self.buttons:
-            button.draw(screen, self.font, mouse_pos)
+            button.invalidate()
 
     def on_click(self, mouse_pos):
         for button in self.buttons:
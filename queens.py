@@ -1,87 +1,21 @@
 import pygame
-from common.grid import Grid, State
-from common.ui import Button, make_ui
-import common.symbols as symbols
+from common.grid import GridView
+from common.background import BackgroundSolver
+from common.hints import HintPlayer
+from common.ui import Button, TextPanel, make_ui
+from solver.cache import SolveCache
+from solver.dlx import solve_queens_dlx
+from solver.live import LiveSolver
+from solver.queens import QueensGrid, CROWN, EMPTY, QUEENS_COLORS, load_queens
 import sys
 
-class EmptyState(State):
-    def __init__(self):
-        super().__init__('EMPTY', symbols.EMPTY)
-
-    def is_possible(self, grid, cell_x, cell_y):
-        # Check if all other cells of this color are empty
-        this_cell = grid.cells[cell_x][cell_y]
-        cell_color = this_cell.bg_col
-        all_empty = True
-        for cell in grid.iter_cells():
-            if cell == this_cell:
-                continue
-
-            if cell.bg_col == cell_color and not cell.must_be(self.name):
-                all_empty = False
-                break
-
-        if all_empty:
-            return False
-
-        return True
-
-class CrownState(State):
-    def __init__(self):
-        super().__init__('QUEEN', symbols.CROWN)
-
-    def is_possible(self, grid, cell_x, cell_y):
-        # Check if there is a queen in the same row or column
-        for x in range(grid.width):
-            if x != cell_x and grid.must_be(x, cell_y, self.name):
-                return False
-        
-        for y in range(grid.height):
-            if y != cell_y and grid.must_be(cell_x, y, self.name):
-                return False
-            
-        # Check if there is a queen in the 8 cells around this cell
-        for x in range(cell_x - 1, cell_x + 2):
-            for y in range(cell_y - 1, cell_y + 2):
-                if x == cell_x and y == cell_y:
-                    continue
-                
-                if grid.must_be(x, y, self.name):
-                    return False
-
-        # Check if there is a queen on a cell with the same color
-        this_cell = grid.cells[cell_x][cell_y]
-        cell_color = this_cell.bg_col
-        for cell in grid.iter_cells():
-            if cell == this_cell:
-                continue
-
-            if cell.bg_col == cell_color and cell.must_be(self.name):
-                return False
-            
-        return True
-
-
-CROWN = CrownState()
-EMPTY = EmptyState()
-
-class QueensGrid(Grid):
-    def __init__(self, width, height):
-        super().__init__(width, height, 80, (200, 200, 200), (100, 100, 100), [CROWN, EMPTY])
+class QueensView(GridView):
+    def __init__(self, grid, live):
+        super().__init__(grid, 80, (100, 100, 100))
+        self.live = live # Edits go through it so the deductions follow them
         self.paint_color = None
+        self.edit_mode = None
 
-    def clone(self):
-        copy = QueensGrid(self.width, self.height)
-
-        copy.is_original = False
-
-        for x in range(self.width):
-            for y in range(self.height):
-                copy.cells[x][y].states = [state for state in self.cells[x][y].states]
-                copy.cells[x][y].bg_col = self.cells[x][y].bg_col
-        
-        return copy
-    
     def set_paint_color(self, color):
         self.paint_color = color
         self.edit_mode = None
@@ -92,13 +26,14 @@ class QueensGrid(Grid):
     
     def on_cell_click(self, x, y, keyboard):
         if self.paint_color is not None:
-            self.cells[x][y].bg_col = self.paint_color
+            self.grid.paint(x, y, self.paint_color)
+            self.live.removed() # A region may have lost cells
 
         elif self.edit_mode == 'CROWNS':
-            self.cells[x][y].states = [CROWN]
+            self.live.set_given(x, y, [CROWN])
 
         elif self.edit_mode == 'EMPTY':
-            self.cells[x][y].states = [EMPTY]
+            self.live.set_given(x, y, [EMPTY])
 
         return super().on_cell_click(x, y, keyboard)
 
@@ -108,66 +43,123 @@ GRID_SIZE = 9
 pygame.init()
 
 # Set up display
-WIDTH, HEIGHT = 80 * GRID_SIZE + 320, 80 * GRID_SIZE
+WIDTH, HEIGHT = 80 * GRID_SIZE + 320, 80 * GRID_SIZE + 60
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("LinkedIn WFC")
 
 queens_grid = QueensGrid(GRID_SIZE, GRID_SIZE)
-
-queens_colors = {
-    'RED': (255, 0, 0),
-    'BLUE': (0, 0, 255),
-    'GREEN': (0, 255, 0),
-    'YELLOW': (255, 255, 0),
-    'PURPLE': (255, 0, 255),
-    'ORANGE': (255, 165, 0),
-    'CYAN': (0, 255, 255),
-    'PINK': (255, 192, 203),
-    'BROWN': (165, 42, 42),
+queens_grid.cache = SolveCache() # Solving the same board again is a lookup
+live = LiveSolver(queens_grid)
+queens_view = QueensView(queens_grid, live)
+solver = BackgroundSolver(queens_grid)
+hints = HintPlayer(queens_grid, live)
+progress_panel = TextPanel(GRID_SIZE * 80 + 20, 625, 30, [solver, hints])
+stats_overlay = TextPanel(GRID_SIZE * 80 + 20, 660, HEIGHT - 670, queens_grid.stats, visible=False)
+
+ENGINES = {
+    'Propagation': lambda grid: grid.update_superpositions(),
+    'Dancing links': solve_queens_dlx,
 }
 
+engine = 'Propagation'
+
+def next_engine():
+    global engine
+    names = list(ENGINES)
+    engine = names[(names.index(engine) + 1) % len(names)]
+    engine_button.set_text('Engine: ' + engine)
+    solver.cancel()
+    solver.solve = ENGINES[engine]
+
+engine_button = Button(GRID_SIZE * 80 + 20, 580, 280, 40, "Engine: Propagation", (120, 100, 140), next_engine)
+
+def reset():
+    solver.cancel()
+    hints.stop()
+    live.reset()
+
+def replay():
+    solver.cancel()
+    hints.replay()
+
+def toggle_live():
+    live.toggle()
+    live_button.set_text('Live deductions: ' + ('on' if live.enabled else 'off'))
+
+live_button = Button(GRID_SIZE * 80 + 20, 420, 280, 40, "Live deductions: on", (120, 160, 120), toggle_live)
+
+queens_colors = QUEENS_COLORS
+
 if len(sys.argv) == 2:
-    x, y = 0, 0
-    color_list = list(queens_colors.values())
-    with open('configs/queens/'+sys.argv[1], 'r') as f:
-        for line in f:
-            for col_idx in line.split():
-                queens_grid.cells[x][y].bg_col = color_list[int(col_idx)]
-                x += 1
-            x = 0
-            y += 1
+    load_queens('configs/queens/'+sys.argv[1], queens_grid)
+    live.removed()
 
 # UI
 ui = make_ui(
-    Button(GRID_SIZE * 80 + 20, 460, 280, 40, "Solve", (100, 200, 100), queens_grid.update_superpositions),
-    Button(GRID_SIZE * 80 + 20, 500, 280, 40, "Reset", (100, 100, 100), queens_grid.reset),
-    Button(GRID_SIZE * 80 + 20, 400, 140, 40, "Crown", (200, 200, 100), lambda: queens_grid.set_edit_mode('CROWNS')),
-    Button(GRID_SIZE * 80 + 160, 400, 140, 40, "Empty", (100, 100, 200), lambda: queens_grid.set_edit_mode('EMPTY')),
-    *[Button(GRID_SIZE * 80 + 20, 20 + 40 * i, 280, 40, color, queens_colors[color], lambda color=color: queens_grid.set_paint_color(queens_colors[color])) for i, color in enumerate(queens_colors)]
+    Button(GRID_SIZE * 80 + 20, 460, 140, 40, "Hint", (200, 160, 80), hints.hint),
+    Button(GRID_SIZE * 80 + 160, 460, 140, 40, "Replay", (160, 120, 80), replay),
+    Button(GRID_SIZE * 80 + 20, 500, 140, 40, "Solve", (100, 200, 100), solver.start),
+    Button(GRID_SIZE * 80 + 160, 500, 140, 40, "Cancel", (200, 120, 100), solver.cancel),
+    Button(GRID_SIZE * 80 + 20, 540, 140, 40, "Reset", (100, 100, 100), reset),
+    Button(GRID_SIZE * 80 + 160, 540, 140, 40, "Stats", (120, 120, 160), stats_overlay.toggle),
+    engine_button,
+    live_button,
+    Button(GRID_SIZE * 80 + 20, 380, 140, 40, "Crown", (200, 200, 100), lambda: queens_view.set_edit_mode('CROWNS')),
+    Button(GRID_SIZE * 80 + 160, 380, 140, 40, "Empty", (100, 100, 200), lambda: queens_view.set_edit_mode('EMPTY')),
+    *[Button(GRID_SIZE * 80 + 20, 20 + 40 * i, 280, 40, color, queens_colors[color], lambda color=color: queens_view.set_paint_color(queens_colors[color])) for i, color in enumerate(queens_colors)]
 )
 
+def redraw_all():
+    screen.fill((30, 30, 30))
+    queens_view.invalidate()
+    ui.invalidate()
+    progress_panel.invalidate()
+    stats_overlay.invalidate()
+
 # Main loop
+clock = pygame.time.Clock()
+pygame.event.post(pygame.event.Event(pygame.VIDEOEXPOSE)) # Draws the first frame
+
 running = True
 while running:
+    # Block until there is an event instead of spinning, then only draw what changed.
+    # While solving or replaying, wake up regularly to show the progress
+    events = [pygame.event.wait(50 if solver.running or hints.running else 0)] + pygame.event.get()
     keyboard = pygame.key.get_pressed()
     mouse_pos = pygame.mouse.get_pos()
-    for event in pygame.event.get():
+    full_redraw = False
+    for event in events:
         if event.type == pygame.QUIT:
             running = False
         elif event.type == pygame.MOUSEBUTTONDOWN:
-            queens_grid.on_click(*mouse_pos, keyboard)
+            queens_view.on_click(*mouse_pos, keyboard)
             ui.on_click(mouse_pos)
-
-    if keyboard[pygame.K_r]:
-        queens_grid.update_superpositions()
-    
-    # Fill screen with a color (optional)
-    screen.fill((30, 30, 30))
-    queens_grid.draw(screen)
-    ui.draw(screen, mouse_pos)
-    
-    # Update display
-    pygame.display.flip()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+            solver.start()
+        elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+            full_redraw = True
+
+    # Picks up the solver progress, or restarts the solve if one of the events above edited the grid
+    solver.poll()
+    hints.poll()
+    queens_view.highlight = hints.highlight()
+
+    if full_redraw:
+        redraw_all()
+
+    dirty = queens_view.draw(screen) + ui.draw(screen, mouse_pos)
+    for panel in (progress_panel, stats_overlay):
+        rect = panel.draw(screen)
+        if rect is not None:
+            dirty.append(rect)
+
+    if full_redraw:
+        pygame.display.flip()
+    elif dirty:
+        pygame.display.update(dirty)
+
+    # Caps the frame rate while events keep coming, e.g. when the mouse moves
+    clock.tick(60)
 
 # Quit Pygame
 pygame.quit()
@@ -0,0 +1,97 @@
+import argparse
+import sys
+
+from solver.cache import SolveCache
+from solver.games import LOADERS
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver', description='Solve a LinkedIn puzzle without opening a window')
+    parser.add_argument('game', choices=sorted(LOADERS))
+    parser.add_argument('path', help='Puzzle config file, e.g. configs/queens/25feb15, a puzzle pack with --index, or a PNG screenshot')
+    parser.add_argument('--index', type=int, help='Solve this puzzle of the pack given as path')
+    parser.add_argument('--stats', action='store_true', help='Print solver counters to stderr')
+    parser.add_argument('--sweep', action='store_true', help='Use the full-grid sweep instead of the worklist propagation')
+    parser.add_argument('--compact', action='store_true', help='Store superpositions as bitmasks in a flat bytearray')
+    parser.add_argument('--numpy', action='store_true', help='Use the vectorized propagator (tango only)')
+    parser.add_argument('--dlx', action='store_true', help='Solve as an exact cover problem with dancing links (queens only)')
+    parser.add_argument('--search', action='store_true', help='Run a complete depth-first search instead of the lookahead')
+    parser.add_argument('--count', type=int, metavar='K', help='Count solutions, stopping at K')
+    parser.add_argument('--unique', action='store_true', help='Check that the puzzle has exactly one solution')
+    parser.add_argument('--max-nodes', type=int, help='Search node budget')
+    parser.add_argument('--timeout', type=float, help='Search time budget in seconds')
+    parser.add_argument('--workers', type=int, help='Probe branches / search subtrees on a pool of this many processes')
+    parser.add_argument('--cache-mb', type=float, help='Memoize probe and search results in an LRU cache of this many MiB')
+    args = parser.parse_args(argv)
+    if args.dlx and args.game != 'queens':
+        parser.error('--dlx only works for queens')
+
+    try:
+        if args.path.lower().endswith('.png'):
+            from solver.screenshot import load_screenshot
+            grid = load_screenshot(args.game, args.path, compact=args.compact)
+        elif args.index is None:
+            grid = LOADERS[args.game](args.path, compact=args.compact)
+        else:
+            from solver.pack import load_puzzle
+            grid = load_puzzle(args.game, args.path, args.index, compact=args.compact)
+    except (OSError, ValueError, IndexError) as e:
+        parser.error(f'Cannot load {args.path}: {e}')
+    if args.cache_mb:
+        grid.cache = SolveCache(int(args.cache_mb * 1024 * 1024))
+    if args.search or args.count or args.unique:
+        return run_search(grid, args)
+
+    if args.numpy and args.game == 'tango':
+        from solver.tango_numpy import solve_tango_boards
+        solve_tango_boards([grid])
+    elif args.dlx:
+        from solver.dlx import solve_queens_dlx
+        solve_queens_dlx(grid)
+    elif args.workers:
+        from solver.parallel import ParallelSolver
+        with ParallelSolver(args.workers) as solver:
+            solver.update_superpositions(grid)
+    else:
+        grid.update_superpositions(worklist=not args.sweep)
+
+    print(grid.to_text())
+    if args.stats:
+        print_stats(grid)
+
+    if grid.has_contradiction():
+        print('No solution', file=sys.stderr)
+        return 1
+    if not grid.is_solved():
+        print('Could not fully solve the puzzle', file=sys.stderr)
+        return 1
+    return 0
+
+def print_stats(grid):
+    print(grid.stats, file=sys.stderr)
+    if grid.cache is not None:
+        print(grid.cache, file=sys.stderr)
+
+def run_search(grid, args):
+    limit = args.count or (2 if args.unique else 1)
+    if args.dlx:
+        from solver.dlx import search_queens_dlx
+        result = search_queens_dlx(grid, limit, args.max_nodes, args.timeout)
+    elif args.workers:
+        from solver.parallel import ParallelSolver
+        with ParallelSolver(args.workers) as solver:
+            result = solver.search(grid, limit, args.max_nodes, args.timeout)
+    else:
+        result = grid.search(limit, args.max_nodes, args.timeout)
+
+    if result.solutions:
+        print(result.solutions[0].to_text())
+    print(' '.join(f'{key}={value}' for key, value in result.as_dict().items()), file=sys.stderr)
+    if args.stats:
+        print_stats(grid)
+
+    if args.unique:
+        return 0 if result.status == 'unique' else 1
+    return 0 if result.solutions else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from solver.games import LOADERS
+from solver.pack import is_pack, load_puzzle, open_pack
+
+def iter_paths(patterns):
+    # Directories are expanded to the files they contain, everything else is a glob. Nothing is listed up front
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for entry in sorted(os.scandir(pattern), key=lambda entry: entry.name):
+                if entry.is_file():
+                    yield entry.path
+        else:
+            for path in sorted(glob.iglob(pattern)):
+                if os.path.isfile(path):
+                    yield path
+
+def iter_puzzles(paths):
+    # (path, None) for text config files, (path, k) for every puzzle of a pack
+    for path in paths:
+        if is_pack(path):
+            for k in range(len(open_pack(path))):
+                yield path, k
+        else:
+            yield path, None
+
+def solve_file(game, path, mode, index=None):
+    start = time.perf_counter()
+    record = {'path': path if index is None else f'{path}#{index}', 'game': game}
+    try:
+        grid = LOADERS[game](path) if index is None else load_puzzle(game, path, index)
+    except (OSError, ValueError, IndexError) as e:
+        record.update(status='error', error=str(e), seconds=time.perf_counter() - start)
+        return record
+
+    try:
+        return solve_grid(grid, mode, record, start)
+    except Exception as e: # A bad puzzle only costs its own record
+        record.update(status='error', error=repr(e), seconds=time.perf_counter() - start)
+        return record
+
+def solve_grid(grid, mode, record, start):
+    # Fills in the record of an already loaded puzzle, shared with the solver service
+    if mode == 'lookahead':
+        grid.update_superpositions()
+        if grid.has_contradiction():
+            status = 'none'
+        else:
+            status = 'solved' if grid.is_solved() else 'unknown'
+        solution = grid if status == 'solved' else None
+        record['nodes'] = 0
+    else:
+        result = grid.search(2 if mode == 'unique' else 1)
+        status = result.status
+        solution = result.solutions[0] if result.solutions else None
+        record['nodes'] = result.nodes
+
+    record.update(
+        status=status,
+        solution=solution.to_text().split('\n') if solution else None,
+        branches=grid.stats.probes + grid.stats.branches, # 0 when propagation alone solved the puzzle
+        seconds=time.perf_counter() - start,
+        stats=grid.stats.as_dict(),
+    )
+    return record
+
+def solve_all(game, paths, mode='unique', workers=1):
+    # Yields one record per puzzle as soon as it is solved, keeping at most 2 puzzles per worker in flight.
+    # Puzzles from a pack are sent as (path, index), each worker maps the pack once and reads only its records
+    if workers <= 1:
+        for path, index in iter_puzzles(paths):
+            yield solve_file(game, path, mode, index)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = {}
+        for path, index in iter_puzzles(paths):
+            pending[executor.submit(solve_file, game, path, mode, index)] = (path, index)
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pool_record(game, future, *pending.pop(future))
+
+        for future in list(pending):
+            yield pool_record(game, future, *pending.pop(future))
+
+def pool_record(game, future, path, index):
+    # solve_file doesn't raise, but the worker running it can die
+    try:
+        return future.result()
+    except Exception as e:
+        return {'path': path if index is None else f'{path}#{index}', 'game': game, 'status': 'error', 'error': repr(e)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver.batch', description='Solve many puzzle files and write one JSON line per puzzle')
+    parser.add_argument('game', choices=sorted(LOADERS))
+    parser.add_argument('paths', nargs='+', help='Files, directories, glob patterns or puzzle packs, e.g. "configs/queens/*"')
+    parser.add_argument('--mode', choices=['unique', 'search', 'lookahead'], default='unique',
+                        help='unique: check there is exactly one solution, search: find one, lookahead: update_superpositions only')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help='Write the JSONL records to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    counts = {}
+    total = 0
+    start = time.perf_counter()
+    try:
+        for record in solve_all(args.game, iter_paths(args.paths), args.mode, args.workers):
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+            total += 1
+    finally:
+        if args.output:
+            out.close()
+
+    seconds = time.perf_counter() - start
+    summary = ' '.join(f'{status}={count}' for status, count in sorted(counts.items()))
+    print(f'{total} puzzles in {seconds:.2f}s ({total / seconds if seconds else 0:.1f}/s) {summary}', file=sys.stderr)
+    return 0 if counts.get('error', 0) == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
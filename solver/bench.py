@@ -0,0 +1,303 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from solver.cache import SolveCache
+from solver.generate import random_queens, random_tango
+from solver.grid import Cancelled
+from solver.queens import load_queens
+from solver.tango import load_tango
+
+PUZZLES = [
+    ('tango', 'configs/tango/sample', load_tango),
+    ('queens', 'configs/queens/test', load_queens),
+    ('queens', 'configs/queens/25feb15', load_queens),
+]
+
+def measure_memory(loader, path, compact):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    grid = loader(path, compact=compact)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / (grid.width * grid.height)
+
+def measure_time(loader, path, compact, repeat, solve):
+    grids = [loader(path, compact=compact) for _ in range(repeat)]
+    start = time.perf_counter()
+    for grid in grids:
+        solve(grid)
+    return (time.perf_counter() - start) / repeat
+
+def bench_domains(args):
+    repeat = args.repeat
+    print(f'{"puzzle":<24} {"model":<8} {"bytes/cell":>10} {"propagate ms":>13} {"solve ms":>10}')
+    for game, path, loader in PUZZLES:
+        for compact in (False, True):
+            bytes_per_cell = measure_memory(loader, path, compact)
+            propagate = measure_time(loader, path, compact, repeat, lambda grid: grid.propagate())
+            solve = measure_time(loader, path, compact, max(1, repeat // 10), lambda grid: grid.update_superpositions())
+            model = 'bitmask' if compact else 'objects'
+            print(f'{path.split("/", 1)[1]:<24} {model:<8} {bytes_per_cell:>10.1f} {propagate * 1000:>13.3f} {solve * 1000:>10.1f}')
+
+def bench_tango_numpy(args):
+    repeat = args.repeat
+    from solver.tango_numpy import solve_tango_boards
+
+    print(f'{"boards":>8} {"objects boards/s":>17} {"numpy boards/s":>15}')
+    for count in (1, 10, 100, 1000):
+        grids = [load_tango('configs/tango/sample') for _ in range(count)]
+        start = time.perf_counter()
+        for grid in grids[:min(count, repeat)]:
+            grid.update_superpositions()
+        objects = min(count, repeat) / (time.perf_counter() - start)
+
+        grids = [load_tango('configs/tango/sample') for _ in range(count)]
+        start = time.perf_counter()
+        solve_tango_boards(grids)
+        vectorized = count / (time.perf_counter() - start)
+
+        print(f'{count:>8} {objects:>17.0f} {vectorized:>15.0f}')
+
+class AllocationCounter:
+    # Blocks allocated over a solve: the growth of the interpreter's live block count between every branch and
+    # backtrack, summed. A block a probe allocates and its backtrack frees still counts, which a before/after diff
+    # misses. With hold_clones, every branch also clones the grid and keeps the clone until its backtrack, the way
+    # the lookahead explored branches before the trail
+    def __init__(self, grid, hold_clones):
+        self.grid = grid
+        self.hold_clones = hold_clones
+        self.clones = []
+        self.allocated = 0
+        self.blocks = 0
+
+    def step(self):
+        blocks = sys.getallocatedblocks()
+        self.allocated += max(0, blocks - self.blocks)
+        self.blocks = blocks
+
+    def on_branch(self, grid, x, y, state):
+        self.step()
+        if self.hold_clones:
+            self.clones.append(grid.clone())
+
+    def on_backtrack(self, grid, x, y, state, contradiction):
+        self.step()
+        if self.hold_clones:
+            self.clones.pop()
+
+    def run(self, solve):
+        stats = self.grid.stats
+        self.blocks = sys.getallocatedblocks()
+        stats.subscribe('branch', self.on_branch)
+        stats.subscribe('backtrack', self.on_backtrack)
+        try:
+            solve(self.grid)
+        finally:
+            stats.unsubscribe('branch', self.on_branch)
+            stats.unsubscribe('backtrack', self.on_backtrack)
+        self.step()
+
+MEMORY_BOARDS = [
+    ('queens', 8, random_queens),
+    ('tango', 8, random_tango),
+]
+
+def bench_memory(args):
+    # Lookahead on seeded boards that need probing, exploring branches in place (trail) and with the clone per
+    # branch the trail replaced. Peak KiB is measured on a separate run so tracemalloc doesn't skew the timings
+    print(f'{"game":<7} {"size":>4} {"model":<7} {"probes":>7} {"clones":>7} {"peak KiB":>9} {"allocs":>8} {"solve ms":>9}')
+    for game, n, make in MEMORY_BOARDS:
+        for hold_clones in (False, True):
+            probes = clones = peak = allocated = seconds = 0
+            for i in range(args.boards):
+                grid = make(n, n * 1000 + i)
+                counter = AllocationCounter(grid, hold_clones)
+                start = time.perf_counter()
+                counter.run(lambda grid: grid.update_superpositions())
+                seconds += time.perf_counter() - start
+                allocated += counter.allocated
+                probes += grid.stats.probes
+                clones += grid.stats.clones
+
+                grid = make(n, n * 1000 + i)
+                tracemalloc.start()
+                AllocationCounter(grid, hold_clones).run(lambda grid: grid.update_superpositions())
+                peak += tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            boards = args.boards
+            print(f'{game:<7} {n:>4} {"clones" if hold_clones else "trail":<7} {probes / boards:>7.0f} {clones / boards:>7.0f} '
+                  f'{peak / boards / 1024:>9.1f} {allocated / boards:>8.0f} {seconds * 1000 / boards:>9.1f}', flush=True)
+
+def bench_parallel(args):
+    repeat = args.repeat
+    from solver.parallel import ParallelSolver
+
+    boards = [random_queens(n, seed) for n in (11, 12) for seed in range(max(1, repeat // 10))]
+
+    start = time.perf_counter()
+    for grid in boards:
+        grid.search(1000)
+    serial = time.perf_counter() - start
+    print(f'{"workers":>7} {"search s":>9} {"speedup":>8}')
+    print(f'{"serial":>7} {serial:>9.2f} {1:>8.2f}')
+
+    for workers in (1, 2, 4, 8):
+        with ParallelSolver(workers) as solver:
+            start = time.perf_counter()
+            for grid in boards:
+                solver.search(grid, 1000)
+            seconds = time.perf_counter() - start
+        print(f'{workers:>7} {seconds:>9.2f} {serial / seconds:>8.2f}')
+
+# Seeded generators, so that runs on different commits solve the same boards
+SUITE = {
+    'queens': (range(6, 21, 2), lambda n, seed: random_queens(n, seed)),
+    'tango': (range(6, 17, 2), lambda n, seed: random_tango(n, seed)),
+}
+
+ENGINES = {
+    'lookahead': lambda grid, args: grid.update_superpositions(args.depth),
+    'search': lambda grid, args: grid.search(1, args.max_nodes),
+}
+
+def run_engine(engine, grid, args):
+    # Returns False if the board ran out of time
+    deadline = time.perf_counter() + args.timeout
+    grid.cancel = lambda: time.perf_counter() > deadline
+    try:
+        ENGINES[engine](grid, args)
+    except Cancelled:
+        return False
+    return True
+
+def bench_suite(args):
+    results = []
+    print(f'{"game":<7} {"size":>4} {"engine":<10} {"ms/board":>9} {"checks/board":>13} {"clones/board":>13} {"branches/board":>15} {"peak KiB":>9} {"timeouts":>8}')
+    for game, (sizes, make) in SUITE.items():
+        if args.game and game != args.game:
+            continue
+
+        for n in sizes:
+            if args.sizes and n not in args.sizes:
+                continue
+
+            for engine in ENGINES:
+                boards = [make(n, n * 1000 + i) for i in range(args.boards)]
+                timeouts = 0
+                start = time.perf_counter()
+                for grid in boards:
+                    timeouts += not run_engine(engine, grid, args)
+                seconds = time.perf_counter() - start
+
+                # Peak memory is measured on a separate run so tracemalloc doesn't skew the timings
+                grid = make(n, n * 1000)
+                tracemalloc.start()
+                run_engine(engine, grid, args)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                result = {
+                    'game': game,
+                    'size': n,
+                    'engine': engine,
+                    'boards': len(boards),
+                    'ms_per_board': seconds * 1000 / len(boards),
+                    'checks_per_board': sum(grid.stats.checks for grid in boards) / len(boards),
+                    'clones_per_board': sum(grid.stats.clones for grid in boards) / len(boards),
+                    'branches_per_board': sum(grid.stats.probes + grid.stats.branches for grid in boards) / len(boards),
+                    'peak_kib': peak / 1024,
+                    'timeouts': timeouts,
+                }
+                results.append(result)
+                print(f'{game:<7} {n:>4} {engine:<10} {result["ms_per_board"]:>9.1f} {result["checks_per_board"]:>13.0f} '
+                      f'{result["clones_per_board"]:>13.1f} {result["branches_per_board"]:>15.1f} {result["peak_kib"]:>9.1f} {timeouts:>8}', flush=True)
+
+    if args.json:
+        settings = {key: getattr(args, key) for key in ('boards', 'depth', 'max_nodes', 'timeout')}
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(), 'settings': settings, 'results': results}, f, indent=2)
+
+def bench_cache(args):
+    # First solution, then a uniqueness check, then the same check again, the way callers tend to chain searches
+    print(f'{"game":<7} {"size":>4} {"cache":<6} {"nodes 1+2":>10} {"nodes again":>12} {"ms/board":>9} {"hit rate":>9}')
+    for game, (sizes, make) in SUITE.items():
+        if args.game and game != args.game:
+            continue
+
+        for n in sizes:
+            if args.sizes and n not in args.sizes:
+                continue
+
+            for cached in (False, True):
+                cache = SolveCache() if cached else None
+                first_nodes = 0
+                again_nodes = 0
+                start = time.perf_counter()
+                for i in range(args.boards):
+                    grid = make(n, n * 1000 + i)
+                    grid.cache = cache
+                    first_nodes += grid.search(1, args.max_nodes).nodes + grid.search(2, args.max_nodes).nodes
+                    again_nodes += grid.search(2, args.max_nodes).nodes
+                seconds = time.perf_counter() - start
+
+                lookups = cache.hits + cache.misses if cached else 0
+                hit_rate = f'{cache.hits / lookups * 100:.0f}%' if lookups else '-'
+                print(f'{game:<7} {n:>4} {"on" if cached else "off":<6} {first_nodes / args.boards:>10.1f} {again_nodes / args.boards:>12.1f} '
+                      f'{seconds * 1000 / args.boards:>9.1f} {hit_rate:>9}', flush=True)
+
+def bench_dlx(args):
+    # Uniqueness check (search for 2 solutions) with the propagation search and with dancing links
+    from solver.dlx import search_queens_dlx
+
+    sizes = args.sizes or [8, 10, 12, 14, 16, 18, 20, 24]
+    print(f'{"size":>4} {"search ms":>10} {"search nodes":>13} {"dlx ms":>9} {"dlx nodes":>10} {"speedup":>8}')
+    for n in sizes:
+        search_seconds = dlx_seconds = 0
+        search_nodes = dlx_nodes = 0
+        for i in range(args.boards):
+            grid = random_queens(n, n * 1000 + i)
+            start = time.perf_counter()
+            search_nodes += grid.search(2, args.max_nodes).nodes
+            search_seconds += time.perf_counter() - start
+
+            grid = random_queens(n, n * 1000 + i)
+            start = time.perf_counter()
+            dlx_nodes += search_queens_dlx(grid, 2, args.max_nodes).nodes
+            dlx_seconds += time.perf_counter() - start
+
+        print(f'{n:>4} {search_seconds * 1000 / args.boards:>10.1f} {search_nodes / args.boards:>13.1f} '
+              f'{dlx_seconds * 1000 / args.boards:>9.1f} {dlx_nodes / args.boards:>10.1f} {search_seconds / dlx_seconds:>8.2f}', flush=True)
+
+BENCHMARKS = {
+    'cache': bench_cache,
+    'dlx': bench_dlx,
+    'domains': bench_domains,
+    'memory': bench_memory,
+    'parallel': bench_parallel,
+    'suite': bench_suite,
+    'tango-numpy': bench_tango_numpy,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver.bench', description='Solver benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--game', choices=sorted(SUITE), help='suite, cache: only run this game')
+    parser.add_argument('--sizes', type=int, nargs='+', help='suite, cache, dlx: only run these board sizes')
+    parser.add_argument('--boards', type=int, default=3, help='suite, cache, dlx, memory: boards per size')
+    parser.add_argument('--depth', type=int, default=3, help='suite: recursion depth of the lookahead')
+    parser.add_argument('--max-nodes', type=int, default=2000, help='suite, cache, dlx: node budget of the search')
+    parser.add_argument('--timeout', type=float, default=5, help='suite: time budget per board in seconds')
+    parser.add_argument('--json', help='suite: also write the results to this file')
+    args = parser.parse_args(argv)
+
+    BENCHMARKS[args.benchmark](args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
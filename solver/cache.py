@@ -0,0 +1,81 @@
+import sys
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+def entry_size(obj):
+    # Rough number of bytes held by a cached key or value, enough to keep the cache under its cap
+    if isinstance(obj, (bytes, str)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        return sys.getsizeof(obj) + sum(entry_size(item) for item in obj)
+    return 0 # Small ints, bools and None are shared by the interpreter
+
+class SolveCache:
+    # Bounded LRU of solver results keyed by Grid.state_key(). A grid and its clones share the same cache,
+    # possibly from several threads (a cancelled background solve can still be winding down), hence the lock
+    ENTRY_OVERHEAD = 100 # Bytes of dict and linked list bookkeeping per entry
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # Key -> (value, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = entry_size(key) + entry_size(value) + self.ENTRY_OVERHEAD
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+
+            self.entries[key] = (value, size)
+            self.bytes += size
+
+            while self.bytes > self.max_bytes and self.entries:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def as_dict(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def lines(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0
+        return [
+            f'cache {len(self.entries)} entries  {self.bytes / 1024:.0f} KiB',
+            f'  hits {self.hits}  misses {self.misses} ({hit_rate:.0f}%)  evicted {self.evictions}',
+        ]
+
+    def __str__(self):
+        return '\n'.join(self.lines())
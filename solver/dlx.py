@@ -0,0 +1,227 @@
+import time
+
+from solver.grid import SolveResult
+from solver.queens import CROWN, EMPTY
+
+class ExactCover:
+    # Knuth's dancing links over parallel lists. Node 0 is the root, nodes 1..column_count are the column headers.
+    # Primary columns must be covered exactly once, secondary columns at most once
+    def __init__(self, primary_count, secondary_count):
+        count = primary_count + secondary_count + 1
+        self.left = list(range(count))
+        self.right = list(range(count))
+        self.up = list(range(count))
+        self.down = list(range(count))
+        self.column = list(range(count))
+        self.size = [0] * count
+        self.row_of = [None] * count # Matrix row id of each node
+
+        # Only primary headers are in the root's list, secondary headers stay linked to themselves
+        ring = [0] + list(range(1, primary_count + 1))
+        for i, node in enumerate(ring):
+            self.right[node] = ring[(i + 1) % len(ring)]
+            self.left[node] = ring[i - 1]
+
+    def add_row(self, row_id, columns):
+        first = None
+        for column in columns:
+            header = column + 1
+            node = len(self.up)
+            self.column.append(header)
+            self.row_of.append(row_id)
+            self.up.append(self.up[header])
+            self.down.append(header)
+            self.down[self.up[header]] = node
+            self.up[header] = node
+            self.size[header] += 1
+
+            if first is None:
+                first = node
+                self.left.append(node)
+                self.right.append(node)
+            else:
+                self.left.append(self.left[first])
+                self.right.append(first)
+                self.right[self.left[first]] = node
+                self.left[first] = node
+
+    def cover(self, header):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        i = down[header]
+        while i != header:
+            j = right[i]
+            while j != i:
+                up[down[j]] = up[j]
+                down[up[j]] = down[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, header):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[header]
+        while i != header:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                up[down[j]] = j
+                down[up[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def select(self, row_id_nodes):
+        # Force rows into every solution (givens). False if two of them clash
+        covered = set()
+        for node in row_id_nodes:
+            headers = [node]
+            j = self.right[node]
+            while j != node:
+                headers.append(j)
+                j = self.right[j]
+
+            for j in headers:
+                if self.column[j] in covered:
+                    return False
+            for j in headers:
+                covered.add(self.column[j])
+                self.cover(self.column[j])
+        return True
+
+    def search(self, result, max_nodes, deadline, check_cancel, partial):
+        # Algorithm X, returns True when the search has to stop (limit reached or out of budget)
+        if self.right[0] == 0:
+            result.solutions.append(list(partial))
+            return len(result.solutions) >= result.limit
+
+        # Column with the fewest rows left
+        best = None
+        header = self.right[0]
+        while header != 0:
+            if best is None or self.size[header] < self.size[best]:
+                best = header
+                if self.size[header] <= 1:
+                    break
+            header = self.right[header]
+
+        if self.size[best] == 0:
+            return False
+
+        self.cover(best)
+        node = self.down[best]
+        while node != best:
+            if max_nodes is not None and result.nodes >= max_nodes:
+                self.uncover(best)
+                return True
+            result.nodes += 1
+            check_cancel()
+            if deadline is not None and time.perf_counter() > deadline:
+                self.uncover(best)
+                return True
+
+            partial.append(self.row_of[node])
+            j = self.right[node]
+            while j != node:
+                self.cover(self.column[j])
+                j = self.right[j]
+
+            stop = self.search(result, max_nodes, deadline, check_cancel, partial)
+
+            j = self.left[node]
+            while j != node:
+                self.uncover(self.column[j])
+                j = self.left[j]
+            partial.pop()
+
+            if stop:
+                self.uncover(best)
+                return True
+            node = self.down[node]
+
+        self.uncover(best)
+        return False
+
+def compile_queens(grid):
+    # One matrix row per cell that can still hold a queen. Regions are primary columns, and so are rows and columns
+    # when there are as many regions as lines. Every 2x2 block is a secondary column, since two queens in one would touch.
+    # Returns the matrix and the nodes of the queens already placed
+    regions = len(grid.region_cells)
+    every_line = regions == grid.width == grid.height
+    blocks = (grid.width - 1) * (grid.height - 1)
+
+    # Column layout: regions, then rows and columns before the blocks if they are primary, after them otherwise
+    if every_line:
+        row_base = regions
+        block_base = regions + grid.height + grid.width
+        primary = block_base
+    else:
+        row_base = regions + blocks
+        block_base = regions
+        primary = regions
+    col_base = row_base + grid.height
+
+    matrix = ExactCover(primary, regions + blocks + grid.height + grid.width - primary)
+    givens = []
+    for x, y in grid.iter_cell_coords():
+        if not grid.can_be(x, y, CROWN.name):
+            continue
+
+        columns = [grid.region_ids[x][y], row_base + y, col_base + x]
+        for block_x in range(max(0, x - 1), min(grid.width - 1, x + 1)):
+            for block_y in range(max(0, y - 1), min(grid.height - 1, y + 1)):
+                columns.append(block_base + block_y * (grid.width - 1) + block_x)
+
+        if grid.must_be(x, y, CROWN.name):
+            givens.append(len(matrix.up))
+        matrix.add_row((x, y), columns)
+
+    return matrix, givens
+
+def search_queens_placements(grid, limit=1, max_nodes=None, timeout=None):
+    # Like search_queens_dlx, but the solutions are sets of queen coordinates instead of solved clones, for callers
+    # that check many boards and only need the queens
+    result = SolveResult(limit)
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    start = time.perf_counter()
+
+    with grid.stats.phase('dlx'):
+        stopped = False
+        if not grid.has_contradiction():
+            matrix, givens = compile_queens(grid)
+            if matrix.select(givens):
+                stopped = matrix.search(result, max_nodes, deadline, grid.check_cancel, [])
+        result.exhausted = not stopped
+
+    grid.stats.branches += result.nodes
+    placed = {matrix.row_of[node] for node in givens} if result.solutions else set()
+    result.solutions = [set(queens) | placed for queens in result.solutions]
+    result.seconds = time.perf_counter() - start
+    result.stats = grid.stats
+    return result
+
+def search_queens_dlx(grid, limit=1, max_nodes=None, timeout=None):
+    # Same contract as Grid.search: up to `limit` solved clones of the grid, the grid itself is left as it was
+    result = search_queens_placements(grid, limit, max_nodes, timeout)
+    start = time.perf_counter()
+    placements = result.solutions
+    result.solutions = []
+    for queens in placements:
+        solution = grid.clone()
+        for x, y in grid.iter_cell_coords():
+            solution.set_states(x, y, [CROWN if (x, y) in queens else EMPTY])
+        result.solutions.append(solution)
+
+    result.seconds += time.perf_counter() - start
+    return result
+
+def solve_queens_dlx(grid):
+    # Drop-in for update_superpositions: collapses the grid to its first solution, or empties a cell if there is none
+    result = search_queens_dlx(grid)
+    if result.solutions:
+        grid.set_state_masks(result.solutions[0].state_masks())
+    else:
+        grid.set_states(0, 0, [])
+    return grid.stats
@@ -0,0 +1,8 @@
+from solver.queens import load_queens
+from solver.tango import load_tango
+
+# Kept apart from solver.batch so the single-puzzle CLI doesn't import multiprocessing
+LOADERS = {
+    'queens': load_queens,
+    'tango': load_tango,
+}
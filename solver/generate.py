@@ -0,0 +1,307 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from solver.dlx import search_queens_placements
+from solver.pack import Puzzle, write_pack
+from solver.queens import parse_queens
+from solver.tango import MOON, SUN, TangoGrid
+
+NEIGHBOURS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+def random_queen_columns(n, rng):
+    # Column of the queen in each row, no two queens in the same column or touching diagonally
+    columns = []
+
+    def place(row):
+        if row == n:
+            return True
+
+        candidates = list(range(n))
+        rng.shuffle(candidates)
+        for column in candidates:
+            if column in columns or (columns and abs(columns[-1] - column) <= 1):
+                continue
+
+            columns.append(column)
+            if place(row + 1):
+                return True
+            columns.pop()
+
+        return False
+
+    if not place(0):
+        raise ValueError(f'No queen placement exists for n={n}')
+    return columns
+
+def grow_regions(n, columns, rng):
+    # Grow one region around each queen by random flood fill, regions[row][column] is the region of the cell
+    regions = [[-1] * n for _ in range(n)]
+    frontier = []
+    for row, column in enumerate(columns):
+        regions[row][column] = row
+        frontier.append((row, column))
+
+    while frontier:
+        i = rng.randrange(len(frontier))
+        row, column = frontier[i]
+        free = [(row + dr, column + dc) for dr, dc in NEIGHBOURS
+                if 0 <= row + dr < n and 0 <= column + dc < n and regions[row + dr][column + dc] < 0]
+        if not free:
+            frontier.pop(i)
+            continue
+
+        grow_row, grow_column = rng.choice(free)
+        regions[grow_row][grow_column] = regions[row][column]
+        frontier.append((grow_row, grow_column))
+
+    return regions
+
+def random_queens_regions(n, seed=None):
+    # Regions grown around a random valid placement
+    rng = random.Random(seed)
+    return grow_regions(n, random_queen_columns(n, rng), rng)
+
+def format_regions(regions):
+    # Same format as configs/queens/*
+    return '\n'.join(' '.join(str(region) for region in row) for row in regions) + '\n'
+
+def random_queens(n, seed=None, compact=False):
+    return parse_queens(format_regions(random_queens_regions(n, seed)), compact=compact)
+
+def balanced_lines(n):
+    # Every line of n cells with as many suns as moons and no three in a row (True is a sun)
+    lines = []
+    for line in itertools.product((True, False), repeat=n):
+        if sum(line) != n // 2:
+            continue
+        if any(line[i] == line[i + 1] == line[i + 2] for i in range(n - 2)):
+            continue
+        lines.append(line)
+    return lines
+
+def random_tango_solution(n, rng):
+    # Rows are picked one at a time among the balanced lines, checking the columns as they fill up
+    lines = balanced_lines(n)
+
+    def columns_ok(rows):
+        for x in range(n):
+            column = [row[x] for row in rows]
+            if sum(column) > n // 2 or len(column) - sum(column) > n // 2:
+                return False
+            if len(column) >= 3 and column[-1] == column[-2] == column[-3]:
+                return False
+        return True
+
+    while True:
+        rows = []
+        attempts = 0
+        while len(rows) < n and attempts < 50 * n:
+            attempts += 1
+            row = rng.choice(lines)
+            if columns_ok(rows + [row]):
+                rows.append(row)
+            elif attempts % (5 * n) == 0 and rows:
+                rows.pop() # Back off when stuck
+
+        if len(rows) == n:
+            return rows
+
+def random_tango(n, seed=None, givens=0.3, constraints=None, compact=False):
+    # A random full solution, with a fraction of its cells given and random =/x constraints between neighbours
+    rng = random.Random(seed)
+    rows = random_tango_solution(n, rng)
+    grid = TangoGrid(n, n, compact)
+
+    for x, y in grid.iter_cell_coords():
+        if rng.random() < givens:
+            grid.set_states(x, y, [SUN if rows[y][x] else MOON])
+
+    pairs = set()
+    for _ in range(n if constraints is None else constraints):
+        x, y = rng.randrange(n - 1), rng.randrange(n)
+        cell_a, cell_b = ((x, y), (x + 1, y)) if rng.random() < 0.5 else ((y, x), (y, x + 1))
+        if (cell_a, cell_b) in pairs:
+            continue
+
+        pairs.add((cell_a, cell_b))
+        if rows[cell_a[1]][cell_a[0]] == rows[cell_b[1]][cell_b[0]]:
+            grid.add_equal(cell_a, cell_b)
+        else:
+            grid.add_opposite(cell_a, cell_b)
+
+    return grid
+
+def region_connected_without(regions, row, column):
+    # True if the region of the cell stays in one piece once the cell is taken out of it
+    n = len(regions)
+    region = regions[row][column]
+    cells = {(r, c) for r in range(n) for c in range(n) if regions[r][c] == region} - {(row, column)}
+    start = next(iter(cells))
+    seen = {start}
+    stack = [start]
+    while stack:
+        r, c = stack.pop()
+        for dr, dc in NEIGHBOURS:
+            if (r + dr, c + dc) in cells and (r + dr, c + dc) not in seen:
+                seen.add((r + dr, c + dc))
+                stack.append((r + dr, c + dc))
+    return len(seen) == len(cells)
+
+def unique_queens_regions(n, rng, repairs=100, sample=16, max_nodes=50000):
+    # Regions grown around a planted placement, then repaired until the placement is the only solution. Moving a
+    # cell to a neighbouring region rules out exactly the solutions with a queen on it (its old region loses that
+    # queen) and keeps the planted one as long as the cell isn't planted. Each round samples up to `sample`
+    # solutions and moves the cell shared by most of them into the largest neighbouring region, where one more
+    # cell makes the fewest new solutions. A placement whose repairs stall or whose check runs out of its node
+    # budget is dropped for a new one. About a second per board up to 12x12, then it grows fast: several seconds
+    # at 13x13 and 14x14, half a minute at 16x16
+    while True:
+        columns = random_queen_columns(n, rng)
+        planted = {(column, row) for row, column in enumerate(columns)}
+        regions = grow_regions(n, columns, rng)
+        left = {} # Regions each cell was moved out of. It doesn't go back, or repairs go back and forth
+
+        for _ in range(repairs):
+            result = search_queens_placements(parse_queens(format_regions(regions)), sample, max_nodes)
+            if result.status == 'unique':
+                return regions
+
+            others = [queens - planted for queens in result.solutions if queens != planted]
+            if not others:
+                break # Out of budget before finding another solution
+
+            counts = {}
+            for queens in others:
+                for cell in queens:
+                    counts[cell] = counts.get(cell, 0) + 1
+            cells = list(counts)
+            rng.shuffle(cells)
+            cells.sort(key=counts.get, reverse=True)
+
+            move = None
+            for x, y in cells:
+                moves = [regions[y + dy][x + dx] for dx, dy in NEIGHBOURS
+                         if 0 <= x + dx < n and 0 <= y + dy < n and regions[y + dy][x + dx] != regions[y][x]
+                         and regions[y + dy][x + dx] not in left.get((x, y), ())]
+                if moves and region_connected_without(regions, y, x):
+                    move = x, y, max(moves, key=lambda region: sum(row.count(region) for row in regions))
+                    break
+            if move is None:
+                break # Start over with a new placement
+            x, y, region = move
+            left.setdefault((x, y), set()).add(regions[y][x])
+            regions[y][x] = region
+
+def build_tango(n, givens, equals, opposites):
+    grid = TangoGrid(n, n)
+    for (x, y), state in givens.items():
+        grid.set_states(x, y, [state])
+    for cell_a, cell_b in equals:
+        grid.add_equal(cell_a, cell_b)
+    for cell_a, cell_b in opposites:
+        grid.add_opposite(cell_a, cell_b)
+    return grid
+
+def unique_tango(n, rng, constraints=None):
+    # Starts from a full solution with every cell given and removes givens while the solution stays unique, then
+    # trades some of the givens left for =/x constraints. The board is unique before each removal, so it stays
+    # unique unless the removed cell can take the other symbol: one search on that cell instead of counting solutions
+    rows = random_tango_solution(n, rng)
+    solution = {(x, y): SUN if rows[y][x] else MOON for y in range(n) for x in range(n)}
+    givens = dict(solution)
+    equals = []
+    opposites = []
+
+    def can_remove(cell):
+        rest = {other: state for other, state in givens.items() if other != cell}
+        rest[cell] = MOON if solution[cell] is SUN else SUN
+        return not build_tango(n, rest, equals, opposites).search(1).solutions
+
+    cells = list(givens)
+    rng.shuffle(cells)
+    for cell in cells:
+        if can_remove(cell):
+            del givens[cell]
+
+    budget = n if constraints is None else constraints
+    cells = list(givens)
+    rng.shuffle(cells)
+    for x, y in cells:
+        if len(equals) + len(opposites) >= budget:
+            break
+
+        neighbours = [(x + dx, y + dy) for dx, dy in NEIGHBOURS if 0 <= x + dx < n and 0 <= y + dy < n]
+        other = rng.choice(neighbours)
+        pair = tuple(sorted(((x, y), other)))
+        if pair in equals or pair in opposites:
+            continue
+
+        pairs = equals if solution[(x, y)] is solution[other] else opposites
+        pairs.append(pair)
+        if can_remove((x, y)):
+            del givens[(x, y)]
+        else:
+            pairs.pop()
+
+    return build_tango(n, givens, equals, opposites)
+
+def generate_text(game, n, seed):
+    # One uniquely solvable board in the configs/ text format
+    rng = random.Random(seed)
+    if game == 'queens':
+        return format_regions(unique_queens_regions(n, rng))
+    return Puzzle.from_grid(unique_tango(n, rng)).to_text()
+
+def generate_all(game, n, count, seed=0, workers=1):
+    # Yields the boards in order, seeded per board so the output doesn't depend on the number of workers
+    seeds = [f'{game}-{n}-{seed}-{k}' for k in range(count)]
+    if workers <= 1:
+        for board_seed in seeds:
+            yield generate_text(game, n, board_seed)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(generate_text, [game] * count, [n] * count, seeds, chunksize=max(1, count // (8 * workers)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver.generate', description='Generate uniquely solvable puzzles')
+    parser.add_argument('game', choices=['queens', 'tango'])
+    parser.add_argument('size', type=int, help='Board width and height, even for tango. Queens boards past 12x12 take seconds to minutes each')
+    parser.add_argument('--count', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help='Directory to write one config file per puzzle to')
+    parser.add_argument('--pack', help='Write the puzzles to this puzzle pack')
+    args = parser.parse_args(argv)
+    if args.game == 'tango' and args.size % 2:
+        parser.error('Tango boards have an even size')
+    if args.game == 'queens' and args.size < 4:
+        parser.error('Queens boards need a size of at least 4')
+
+    start = time.perf_counter()
+    texts = generate_all(args.game, args.size, args.count, args.seed, args.workers)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    puzzles = []
+    for k, text in enumerate(texts):
+        if args.output:
+            with open(os.path.join(args.output, f'{args.size}x{args.size}-{args.seed}-{k}'), 'w') as f:
+                f.write(text)
+        if args.pack:
+            puzzles.append(Puzzle.from_text(args.game, text))
+        if not args.output and not args.pack:
+            sys.stdout.write(text + '\n')
+    if args.pack:
+        write_pack(args.pack, args.game, puzzles)
+
+    seconds = time.perf_counter() - start
+    print(f'{args.count} puzzles in {seconds:.2f}s ({args.count / seconds * 60:.0f}/min)', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
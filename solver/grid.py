@@ -0,0 +1,800 @@
+import time
+from collections import deque
+
+from solver.stats import Stats
+
+# Cached value for board states known to have no solution
+DEAD = 'dead'
+
+class Cancelled(Exception):
+    pass
+
+class State:
+    def __init__(self, name, char):
+        self.name = name
+        self.char = char # Used when printing the grid as text
+        self.rule = type(self).__name__ # Key of the per-rule counters in Stats
+
+    def is_possible(self, grid, cell_x, cell_y):
+        raise NotImplementedError()
+
+class Cell:
+    def __init__(self, bg_col, possible_states=None):
+        self.bg_col = bg_col
+        self.states = [s for s in possible_states] if possible_states else []
+
+    def update(self, grid, cell_x, cell_y):
+        stats = grid.stats
+        stats.updates += 1
+
+        kept = []
+        for state in self.states:
+            stats.checks += 1
+            stats.checks_by_rule[state.rule] = stats.checks_by_rule.get(state.rule, 0) + 1
+            if state.is_possible(grid, cell_x, cell_y):
+                kept.append(state)
+
+        if len(kept) == len(self.states):
+            return False
+
+        grid.prune(cell_x, cell_y, kept)
+        return True
+
+    def collapse(self, state_index):
+        self.states = [self.states[state_index]]
+
+    def can_be(self, state_name):
+        for state in self.states:
+            if state.name == state_name:
+                return True
+        return False
+
+    def must_be(self, state_name):
+        if len(self.states) == 1:
+            return self.states[0].name == state_name
+
+        return False
+
+class BitCell:
+    # View of one cell of a compact grid, made when grid.cells is indexed. The superposition is the cell's byte of
+    # grid.domains and the color its entry of grid.bg_cols. The rules and solvers read the masks directly,
+    # views are for everything else (drawing, editing, text output)
+    __slots__ = ('grid', 'index')
+
+    def __init__(self, grid, index):
+        self.grid = grid
+        self.index = index
+
+    @property
+    def states(self):
+        return self.grid.states_by_mask[self.grid.domains[self.index]]
+
+    @states.setter
+    def states(self, states):
+        self.grid.domains[self.index] = self.grid.mask_of(states)
+
+    @property
+    def bg_col(self):
+        return self.grid.bg_cols[self.index]
+
+    @bg_col.setter
+    def bg_col(self, color):
+        self.grid.bg_cols[self.index] = color
+
+    def update(self, grid, cell_x, cell_y):
+        return grid.update_mask(cell_x, cell_y)
+
+    def collapse(self, state_index):
+        self.states = [self.states[state_index]]
+
+    def can_be(self, state_name):
+        return self.grid.domains[self.index] & self.grid.state_bits[state_name] != 0
+
+    def must_be(self, state_name):
+        return self.grid.domains[self.index] == self.grid.state_bits[state_name]
+
+class BitColumn:
+    __slots__ = ('grid', 'x')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.grid.height
+        if not 0 <= y < self.grid.height:
+            raise IndexError('cell index out of range')
+        return BitCell(self.grid, y * self.grid.width + self.x)
+
+    def __len__(self):
+        return self.grid.height
+
+    def __iter__(self):
+        for y in range(self.grid.height):
+            yield self[y]
+
+class BitCells:
+    # Stands in for the cells[x][y] lists of a compact grid, without keeping an object per cell
+    __slots__ = ('grid',)
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += self.grid.width
+        if not 0 <= x < self.grid.width:
+            raise IndexError('column index out of range')
+        return BitColumn(self.grid, x)
+
+    def __len__(self):
+        return self.grid.width
+
+    def __iter__(self):
+        for x in range(self.grid.width):
+            yield self[x]
+
+class SolveResult:
+    def __init__(self, limit):
+        self.limit = limit
+        self.solutions = [] # Solved clones of the grid, in the order they were found
+        self.stats = None
+        self.nodes = 0
+        self.exhausted = False # True if the whole search space was explored, so the solutions are all there is
+        self.seconds = 0
+
+    @property
+    def status(self):
+        if len(self.solutions) > 1:
+            return 'multiple'
+        if not self.exhausted:
+            return 'solved' if self.solutions else 'unknown'
+        return 'unique' if self.solutions else 'none'
+
+    def as_dict(self):
+        return {
+            'status': self.status,
+            'solutions': len(self.solutions),
+            'nodes': self.nodes,
+            'seconds': self.seconds,
+        }
+
+class Deduction:
+    # States ruled out of one cell, and what ruled them out
+    def __init__(self, x, y, removed, rule, depth=0):
+        self.x = x
+        self.y = y
+        self.removed = removed
+        self.rule = rule # Rule of the removed states, a grid-wide rule of infer() or 'probe'
+        self.depth = depth # Lookahead depth of a probe, 0 for the rules
+
+    def __str__(self):
+        names = ', '.join(state.name for state in self.removed)
+        rule = self.rule if self.depth <= 1 else f'{self.rule}, depth {self.depth}'
+        return f'({self.x}, {self.y}) is not {names} ({rule})'
+
+class Grid:
+    def __init__(self, width, height, bg_col, possible_states=None, compact=False):
+        self.width = width
+        self.height = height
+        self.bg_col = bg_col
+        self.possible_states = possible_states
+        self.compact = compact
+
+        if compact:
+            # Superpositions are stored as one bitmask per cell and colors in a flat list, both indexed by y * width + x.
+            # states_by_mask holds the superposition of every mask, so reading one doesn't build a list
+            self.state_bits = {state.name: 1 << i for i, state in enumerate(possible_states)}
+            self.bits = [(state, 1 << i) for i, state in enumerate(possible_states)]
+            self.states_by_mask = [tuple(state for state, bit in self.bits if mask & bit) for mask in range(1 << len(possible_states))]
+            self.domains = bytearray([(1 << len(possible_states)) - 1]) * (width * height)
+            self.bg_cols = [bg_col] * (width * height)
+            self.cells = BitCells(self)
+        else:
+            self.domains = None
+            self.cells = [[Cell(bg_col, possible_states) for _ in range(height)] for _ in range(width)]
+
+        self.is_original = True
+        self.stats = Stats()
+        self.trail = None # (x, y, previous states) entries while a search is running
+        self.cancel = None # Optional callable polled during long operations, raises Cancelled when it returns True
+        self.cache = None # Optional SolveCache of lookahead, probe and search results, shared with clones
+
+    def reset(self):
+        for x in range(self.width):
+            for y in range(self.height):
+                self.set_states(x, y, [s for s in self.possible_states])
+                self.cells[x][y].bg_col = self.bg_col
+
+    def prune(self, x, y, kept, rule=None):
+        # Deduction that removes states from a superposition. Without a rule, it was made by the rules of the removed states
+        states = self.states_at(x, y)
+        if self.stats.hooks:
+            removed = [state for state in states if state not in kept]
+            if rule is None and removed:
+                rule = removed[0].rule
+            self.stats.emit('prune', self, x, y, removed, rule)
+
+        self.stats.pruned += len(states) - len(kept)
+        self.set_states(x, y, kept)
+
+    def set_states(self, x, y, states):
+        # Every change to a superposition goes through here so subclasses can keep indexes up to date
+        if self.compact:
+            index = y * self.width + x
+            if self.trail is not None:
+                self.trail.append((x, y, self.states_by_mask[self.domains[index]]))
+            self.domains[index] = self.mask_of(states)
+            return
+
+        if self.trail is not None:
+            self.trail.append((x, y, self.cells[x][y].states))
+        self.cells[x][y].states = states
+
+    def states_at(self, x, y):
+        # Superposition of a cell, without making a cell view in compact mode
+        if self.compact:
+            return self.states_by_mask[self.domains[y * self.width + x]]
+        return self.cells[x][y].states
+
+    def mask_of(self, states):
+        mask = 0
+        for state in states:
+            mask |= self.state_bits[state.name]
+        return mask
+
+    def update_cell(self, x, y):
+        if self.compact:
+            return self.update_mask(x, y)
+        return self.cells[x][y].update(self, x, y)
+
+    def update_mask(self, x, y):
+        # Cell.update for compact grids, on the cell's bitmask
+        stats = self.stats
+        stats.updates += 1
+
+        mask = self.domains[y * self.width + x]
+        kept = mask
+        for state, bit in self.bits:
+            if mask & bit:
+                stats.checks += 1
+                stats.checks_by_rule[state.rule] = stats.checks_by_rule.get(state.rule, 0) + 1
+                if not state.is_possible(self, x, y):
+                    kept &= ~bit
+
+        if kept == mask:
+            return False
+
+        self.prune(x, y, self.states_by_mask[kept])
+        return True
+
+    def iter_cells(self):
+        for x in range(self.width):
+            for y in range(self.height):
+                yield self.cells[x][y]
+
+    def iter_cell_coords(self):
+        for x in range(self.width):
+            for y in range(self.height):
+                yield x, y
+
+    def iter_col(self, x):
+        for y in range(self.height):
+            yield self.cells[x][y]
+
+    def iter_row(self, y):
+        for x in range(self.width):
+            yield self.cells[x][y]
+
+    def peers(self, x, y):
+        # Cells whose rules read the state of (x, y). Subclasses narrow this down to what their rules actually look at
+        return self.iter_cell_coords()
+
+    def sweep(self):
+        with self.stats.phase('propagate'):
+            updated = True
+            while updated:
+                self.stats.rounds += 1
+                updated = False
+                for x, y in self.iter_cell_coords():
+                    updated = updated or self.update_cell(x, y)
+
+                if not updated:
+                    changed = self.infer()
+                    updated = bool(changed)
+
+    def propagate(self, coords=None):
+        # Runs the worklist below to the end. True at a fixpoint, False on a contradiction
+        self.stats.rounds += 1
+        with self.stats.phase('propagate'):
+            steps = self.propagation(coords)
+            while True:
+                try:
+                    next(steps)
+                except StopIteration as done:
+                    return done.value
+
+    def propagation(self, coords=None):
+        # AC-3 style worklist: only cells whose peers lost a state are updated again. Generator shared by propagate()
+        # and deductions(), it yields after every cell update or infer() that changed the grid and returns like propagate()
+        queue = deque(self.iter_cell_coords() if coords is None else coords)
+        queued = set(queue)
+        compact = self.compact
+        cells = self.cells
+        domains = self.domains
+
+        # A cell that is already empty never changes again, so updating it wouldn't report the contradiction
+        for x, y in queue:
+            if not self.states_at(x, y):
+                return False
+
+        while True:
+            while queue:
+                x, y = queue.popleft()
+                queued.discard((x, y))
+
+                if compact:
+                    if not self.update_mask(x, y):
+                        continue
+                    empty = domains[y * self.width + x] == 0
+                else:
+                    cell = cells[x][y]
+                    if not cell.update(self, x, y):
+                        continue
+                    empty = len(cell.states) == 0
+
+                yield
+                if empty:
+                    return False # No need to go further, the grid has a contradiction
+
+                for peer in self.peers(x, y):
+                    if peer not in queued:
+                        queued.add(peer)
+                        queue.append(peer)
+
+            # The per-cell rules are at a fixpoint, give the grid-wide deductions a turn
+            changed = self.infer()
+            if changed is None:
+                return False
+            if not changed:
+                return True
+
+            yield
+            for x, y in changed:
+                for peer in self.peers(x, y):
+                    if peer not in queued:
+                        queued.add(peer)
+                        queue.append(peer)
+
+    def infer(self):
+        # Deductions that look at more than one cell at a time, run whenever the per-cell rules have nothing left to remove.
+        # Returns the cells that were narrowed down through prune(), or None after emptying a cell that can't be filled,
+        # so has_contradiction() sees it like any other contradiction
+        return []
+
+    def checkpoint(self):
+        # Start recording superposition changes and return a mark that rollback() can return to
+        if self.trail is None:
+            self.trail = []
+        return len(self.trail)
+
+    def rollback(self, mark):
+        trail = self.trail
+        self.trail = None # Restoring must not be recorded itself
+        while len(trail) > mark:
+            x, y, states = trail.pop()
+            self.set_states(x, y, states)
+        self.trail = trail
+
+    def update_superpositions(self, recursion_depth=20, worklist=True, dirty=None):
+        # The outermost call owns the trail; branches are explored in place and rolled back instead of cloned
+        owns_trail = self.trail is None
+        key = None
+        if owns_trail and self.cache is not None:
+            key = ('lookahead', recursion_depth, self.state_key())
+            masks = self.cache.get(key)
+            if masks is not None:
+                self.set_state_masks(masks)
+                return self.stats
+
+        if owns_trail:
+            self.trail = []
+
+        try:
+            with self.stats.phase('lookahead'):
+                self.lookahead(recursion_depth, worklist, dirty)
+        finally:
+            if owns_trail:
+                self.trail = None
+
+        if key is not None:
+            masks = self.state_masks()
+            self.cache.put(key, masks)
+            # Running the lookahead again on its own result doesn't change anything
+            self.cache.put(('lookahead', recursion_depth, self.state_key()), masks)
+
+        return self.stats
+
+    def deductions(self, recursion_depth=2):
+        # Generator of the deductions update_superpositions would make, one at a time and applied to the grid as they are
+        # yielded, so a caller can stop after the first. Cheapest first: the per-cell rules, then infer(), then probes of
+        # increasing depth. Stops after a contradiction or when nothing more can be deduced
+        found = deque()
+        listening = True
+
+        def on_prune(grid, x, y, removed, rule):
+            if grid is self and listening and removed:
+                found.append(Deduction(x, y, removed, rule))
+
+        self.stats.subscribe('prune', on_prune)
+        try:
+            coords = None
+            while True:
+                # The deductions each step of the propagation made, as soon as it made them
+                steps = self.propagation(coords)
+                while True:
+                    try:
+                        next(steps)
+                    except StopIteration as done:
+                        consistent = done.value
+                        break
+                    while found:
+                        yield found.popleft()
+                while found:
+                    yield found.popleft()
+                if not consistent:
+                    return
+
+                # Nothing cheaper left, probe without reporting what the probes deduce on the way
+                listening = False
+                deduction = self.probe_deduction(recursion_depth)
+                listening = True
+                if deduction is None:
+                    return
+                yield deduction
+                coords = [(deduction.x, deduction.y)] + list(self.peers(deduction.x, deduction.y))
+        finally:
+            self.stats.unsubscribe('prune', on_prune)
+
+    def probe_deduction(self, recursion_depth):
+        # Prunes the first state whose probe ends in a contradiction: shallow probes before deep ones, and
+        # the cells with the fewest states first. None if there is no such state
+        cells = sorted((len(self.states_at(x, y)), self.branch_priority(x, y), x, y)
+                       for x, y in self.iter_cell_coords() if len(self.states_at(x, y)) > 1)
+
+        owns_trail = self.trail is None
+        try:
+            for depth in range(recursion_depth):
+                for _, _, x, y in cells:
+                    for state in self.states_at(x, y):
+                        self.check_cancel()
+                        self.stats.probes += 1
+                        mark = self.checkpoint()
+                        self.set_states(x, y, [state])
+                        contradiction = self.probe(depth, True, (x, y))
+                        self.rollback(mark)
+
+                        if contradiction:
+                            self.stats.contradictions += 1
+                            self.prune(x, y, [other for other in self.states_at(x, y) if other is not state], 'probe')
+                            return Deduction(x, y, [state], 'probe', depth + 1)
+        finally:
+            if owns_trail:
+                self.trail = None
+        return None
+
+    def check_cancel(self):
+        if self.cancel is not None and self.cancel():
+            raise Cancelled()
+
+    def lookahead(self, recursion_depth, worklist, dirty):
+        self.check_cancel()
+
+        if worklist:
+            if not self.propagate(dirty):
+                return
+        else:
+            self.sweep()
+
+        if recursion_depth > 0:
+            # Pick the first cell with more than one possible state
+            selected_cell_coords = None
+            for x in range(self.width):
+                for y in range(self.height):
+                    if len(self.states_at(x, y)) > 1:
+                        selected_cell_coords = (x, y)
+                        break
+
+            if selected_cell_coords:
+                selected_cell = self.cells[selected_cell_coords[0]][selected_cell_coords[1]]
+
+                for state_index in range(len(selected_cell.states)):
+                    state = selected_cell.states[state_index]
+                    self.stats.probes += 1
+                    if self.stats.hooks:
+                        self.stats.emit('branch', self, *selected_cell_coords, state)
+
+                    mark = self.checkpoint()
+                    self.collapse(*selected_cell_coords, state_index, update=False)
+                    contradiction = self.probe(recursion_depth - 1, worklist, selected_cell_coords)
+                    self.rollback(mark)
+
+                    if self.stats.hooks:
+                        self.stats.emit('backtrack', self, *selected_cell_coords, state, contradiction)
+
+                    if contradiction:
+                        # Remove this state from the superposition
+                        self.stats.contradictions += 1
+                        self.prune(*selected_cell_coords, [other for other in selected_cell.states if other is not state], 'probe')
+
+                        self.lookahead(recursion_depth - 1, worklist, list(self.peers(*selected_cell_coords)))
+                        break
+
+    def probe(self, recursion_depth, worklist, coords):
+        # Lookahead after collapsing the cell at coords, True if it ends in a contradiction.
+        # With a cache, probe results are stored under the collapsed state: DEAD if it has no solution,
+        # otherwise the depth at which no contradiction was found
+        key = None
+        if self.cache is not None:
+            key = ('probe', self.state_key())
+            known = self.cache.get(key)
+            if known is DEAD or known == recursion_depth:
+                return known is DEAD
+
+        self.lookahead(recursion_depth, worklist, list(self.peers(*coords)))
+        contradiction = self.has_contradiction()
+
+        if key is not None:
+            self.cache.put(key, DEAD if contradiction else recursion_depth)
+        return contradiction
+
+    def branch_priority(self, x, y):
+        # Tie-breaker between cells with the same number of states, lower is explored first
+        return 0
+
+    def select_branch_cell(self):
+        # Minimum remaining values, ties broken by branch_priority
+        best = None
+        best_key = None
+        for x, y in self.iter_cell_coords():
+            count = len(self.states_at(x, y))
+            if count > 1:
+                key = (count, self.branch_priority(x, y))
+                if best_key is None or key < best_key:
+                    best = (x, y)
+                    best_key = key
+        return best
+
+    def search(self, limit=1, max_nodes=None, timeout=None):
+        # Depth-first search for up to `limit` solutions. The grid is left as it was
+        result = SolveResult(limit)
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        start = time.perf_counter()
+
+        key = None
+        if self.cache is not None:
+            key = ('search', limit, self.state_key())
+            known = self.cache.get(key)
+            if known is not None:
+                solutions, result.exhausted = known
+                for masks in solutions:
+                    solution = self.clone()
+                    solution.set_state_masks(masks)
+                    result.solutions.append(solution)
+                result.seconds = time.perf_counter() - start
+                result.stats = self.stats
+                return result
+
+        owns_trail = self.trail is None
+        mark = self.checkpoint()
+        try:
+            with self.stats.phase('search'):
+                stopped = self.search_node(None, result, max_nodes, deadline)
+            result.exhausted = not stopped
+        finally:
+            self.rollback(mark)
+            if owns_trail:
+                self.trail = None
+
+        # A search cut short by the node or time budget says nothing definite, only complete answers are kept
+        if key is not None and (result.exhausted or len(result.solutions) >= limit):
+            self.cache.put(key, (tuple(solution.state_masks() for solution in result.solutions), result.exhausted))
+
+        result.seconds = time.perf_counter() - start
+        result.stats = self.stats
+        return result
+
+    def search_node(self, dirty, result, max_nodes, deadline):
+        # Returns True when the search has to stop (limit reached or out of budget)
+        if max_nodes is not None and result.nodes >= max_nodes:
+            return True
+        result.nodes += 1
+        self.check_cancel()
+        if deadline is not None and time.perf_counter() > deadline:
+            return True
+
+        # States refuted by an earlier search or lookahead probe are skipped without propagating
+        key = None
+        if self.cache is not None:
+            key = ('probe', self.state_key())
+            if self.cache.get(key) is DEAD:
+                self.stats.contradictions += 1
+                return False
+
+        if not self.propagate(dirty):
+            self.stats.contradictions += 1
+            return False
+
+        coords = self.select_branch_cell()
+        if coords is None:
+            result.solutions.append(self.clone())
+            return len(result.solutions) >= result.limit
+
+        found = len(result.solutions)
+
+        for state in self.states_at(*coords):
+            self.stats.branches += 1
+            if self.stats.hooks:
+                self.stats.emit('branch', self, *coords, state)
+
+            mark = self.checkpoint()
+            self.set_states(*coords, [state])
+            stop = self.search_node(list(self.peers(*coords)), result, max_nodes, deadline)
+            self.rollback(mark)
+
+            if self.stats.hooks:
+                self.stats.emit('backtrack', self, *coords, state, None)
+            if stop:
+                return True
+
+        # Every branch was explored without finding a solution
+        if key is not None and len(result.solutions) == found:
+            self.cache.put(key, DEAD)
+        return False
+
+    def first_solution(self, max_nodes=None, timeout=None):
+        result = self.search(1, max_nodes, timeout)
+        return result.solutions[0] if result.solutions else None
+
+    def count_solutions(self, limit, max_nodes=None, timeout=None):
+        return self.search(limit, max_nodes, timeout)
+
+    def is_unique(self, max_nodes=None, timeout=None):
+        # True or False, or None if the budget ran out before the answer was known
+        result = self.search(2, max_nodes, timeout)
+        if result.status == 'unique':
+            return True
+        if result.status in ('none', 'multiple'):
+            return False
+        return None
+
+    def collapse(self, x, y, state_index, update=False):
+        self.set_states(x, y, [self.states_at(x, y)[state_index]])
+
+        if update:
+            self.update_superpositions()
+
+    def can_be(self, x, y, state_name):
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return False
+
+        if self.compact:
+            return self.domains[y * self.width + x] & self.state_bits[state_name] != 0
+
+        return self.cells[x][y].can_be(state_name)
+
+    def must_be(self, x, y, state_name):
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return False
+
+        if self.compact:
+            return self.domains[y * self.width + x] == self.state_bits[state_name]
+
+        return self.cells[x][y].must_be(state_name)
+
+    def copy_states_to(self, grid):
+        if self.compact and grid.compact:
+            grid.domains[:] = self.domains
+            return
+
+        for x in range(self.width):
+            for y in range(self.height):
+                grid.cells[x][y].states = [state for state in self.states_at(x, y)]
+
+    def copy_colors_to(self, grid):
+        if self.compact and grid.compact:
+            grid.bg_cols[:] = self.bg_cols
+            return
+
+        for x in range(self.width):
+            for y in range(self.height):
+                grid.cells[x][y].bg_col = self.cells[x][y].bg_col
+
+    def clone(self):
+        grid = Grid(self.width, self.height, self.bg_col, self.possible_states, self.compact)
+        self.copy_states_to(grid)
+        self.copy_colors_to(grid)
+
+        grid.is_original = False
+        grid.stats = self.stats
+        grid.stats.clones += 1
+        grid.cache = self.cache
+
+        return grid
+
+    def state_masks(self):
+        # One bitmask of possible_states indices per cell, indexed by y * width + x
+        if self.compact:
+            return bytes(self.domains) # Same bit layout
+
+        masks = bytearray(self.width * self.height)
+        for x, y in self.iter_cell_coords():
+            mask = 0
+            for state in self.states_at(x, y):
+                mask |= 1 << self.possible_states.index(state)
+            masks[y * self.width + x] = mask
+        return bytes(masks)
+
+    def set_state_masks(self, masks):
+        for x, y in self.iter_cell_coords():
+            mask = masks[y * self.width + x]
+            self.set_states(x, y, [state for i, state in enumerate(self.possible_states) if mask & (1 << i)])
+
+    def state_key(self):
+        # Canonical hashable description of the board: the superpositions plus whatever else the rules read
+        return (type(self).__name__, self.width, self.height, self.state_masks() + self.key_extra())
+
+    def key_extra(self):
+        raise NotImplementedError()
+
+    def snapshot(self):
+        # Compact picklable copy of the grid, used to ship boards to worker processes
+        return (type(self), self.width, self.height, self.compact, self.state_masks(), self.snapshot_extra())
+
+    def snapshot_extra(self):
+        raise NotImplementedError()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        grid_class, width, height, compact, masks, extra = snapshot
+        grid = grid_class(width, height, compact)
+        grid.load_snapshot_extra(extra)
+        grid.set_state_masks(masks)
+        return grid
+
+    def load_snapshot_extra(self, extra):
+        raise NotImplementedError()
+
+    def has_contradiction(self):
+        if self.compact:
+            return 0 in self.domains
+
+        for x in range(self.width):
+            for y in range(self.height):
+                if len(self.cells[x][y].states) == 0:
+                    return True
+
+        return False
+
+    def is_solved(self):
+        for x, y in self.iter_cell_coords():
+            if len(self.states_at(x, y)) != 1:
+                return False
+
+        return True
+
+    def to_text(self):
+        lines = []
+        for y in range(self.height):
+            chars = []
+            for x in range(self.width):
+                states = self.states_at(x, y)
+                if len(states) == 1:
+                    chars.append(states[0].char)
+                elif len(states) == 0:
+                    chars.append('!') # Contradiction
+                else:
+                    chars.append('?') # Undetermined
+            lines.append(' '.join(chars))
+        return '\n'.join(lines)
@@ -0,0 +1,54 @@
+import time
+
+class LiveSolver:
+    # Keeps the deductions of a grid up to date while it is being edited. What the user entered (the givens) is kept
+    # apart from what was deduced: an edit that only adds information propagates from the cells it touched, an edit
+    # that takes information away puts every cell back to its given states and propagates from there
+    def __init__(self, grid, enabled=True):
+        self.grid = grid
+        self.enabled = enabled
+        self.givens = {} # (x, y) -> states the user put in the cell
+        self.seconds = 0 # Time taken by the last update
+
+    def set_given(self, x, y, states):
+        previous = self.givens.get((x, y), self.grid.possible_states)
+        self.givens[(x, y)] = list(states)
+        self.grid.set_states(x, y, list(states))
+
+        if all(state in previous for state in states):
+            self.added([(x, y)]) # Deductions made from the previous givens still hold
+        else:
+            self.removed()
+
+    def added(self, coords):
+        # Rules or givens were added around these cells
+        if self.enabled:
+            self.update(list(coords) + [peer for x, y in coords for peer in self.grid.peers(x, y)])
+
+    def removed(self):
+        # Rules or givens were taken away, deductions that depended on them have to go
+        if self.enabled:
+            self.rebuild()
+
+    def rebuild(self):
+        self.restore_givens()
+        self.update(None)
+
+    def restore_givens(self):
+        # Puts every cell back to what the user entered, without any deduction
+        for x, y in self.grid.iter_cell_coords():
+            self.grid.set_states(x, y, list(self.givens.get((x, y), self.grid.possible_states)))
+
+    def update(self, coords):
+        start = time.perf_counter()
+        self.grid.propagate(coords)
+        self.seconds = time.perf_counter() - start
+
+    def reset(self):
+        self.givens.clear()
+        self.grid.reset()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.rebuild()
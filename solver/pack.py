@@ -0,0 +1,278 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+from solver.queens import QueensGrid, queens_color, read_queens
+from solver.tango import MOON, SUN, TangoGrid, read_tango
+
+# Binary puzzle pack, little endian:
+#   header   magic, version, game, reserved, puzzle count, offset of the index
+#   records  one per puzzle: width, height, constraint count, one byte per cell (row by row), then the constraints
+#   index    count + 1 offsets, record k is between offsets k and k + 1
+# Records are not fixed width, their size depends on the board and its constraints. Puzzle k is found through the
+# index instead, which costs one 8 byte offset per puzzle and lets a pack mix board sizes.
+# Sizes, cell values and constraint coordinates are bytes (0 to 255), the constraint count two bytes.
+# Queens cells hold the color index of the text format, Tango cells 0 (unknown), 1 (sun) or 2 (moon).
+# Tango constraints are (kind, x1, y1, x2, y2) with kind 0 for '=' and 1 for 'x'
+MAGIC = b'WFCPACK\0'
+VERSION = 1
+GAMES = ('queens', 'tango')
+HEADER = struct.Struct('<8sBBHIQ')
+RECORD = struct.Struct('<BBH')
+CONSTRAINT = struct.Struct('<5B')
+OFFSETS = struct.Struct('<QQ')
+OFFSET = struct.Struct('<Q')
+
+TANGO_CHARS = '.' + SUN.char + MOON.char
+CONSTRAINT_CHARS = '=x'
+
+class Puzzle:
+    # One board as stored in a pack: the givens only, no superpositions
+    def __init__(self, game, width, height, cells, constraints=()):
+        # Checked here rather than left to bytes() and struct, which don't say what was out of range
+        constraints = list(constraints)
+        if not (0 < width < 256 and 0 < height < 256):
+            raise ValueError(f'A {width}x{height} board does not fit in a pack, sizes go up to 255')
+        if not isinstance(cells, bytes): # Records read from a pack are valid already
+            cells = list(cells)
+            for value in cells:
+                if not 0 <= value < 256:
+                    raise ValueError(f'Cell value {value} does not fit in a pack, values go up to 255')
+        if len(cells) != width * height:
+            raise ValueError(f'A {width}x{height} board needs {width * height} cells, got {len(cells)}')
+        if len(constraints) >= 1 << 16:
+            raise ValueError(f'A pack holds up to {(1 << 16) - 1} constraints per board, got {len(constraints)}')
+        for _, (x1, y1), (x2, y2) in constraints:
+            if not (0 <= x1 < width and 0 <= x2 < width and 0 <= y1 < height and 0 <= y2 < height):
+                raise ValueError(f'Constraint between {(x1, y1)} and {(x2, y2)} is off the {width}x{height} board')
+
+        self.game = game
+        self.width = width
+        self.height = height
+        self.cells = bytes(cells) # Row by row
+        self.constraints = constraints # (kind, (x1, y1), (x2, y2)), tango only
+
+    @classmethod
+    def from_text(cls, game, text):
+        # Same formats as configs/queens/* and configs/tango/*, read by the same code as parse_queens and parse_tango
+        if game == 'queens':
+            rows = read_queens(text)
+            return cls(game, len(rows[0]), len(rows), [value for row in rows for value in row])
+
+        rows, equals, opposites = read_tango(text)
+        constraints = [(0, a, b) for a, b in equals] + [(1, a, b) for a, b in opposites]
+        return cls(game, len(rows[0]), len(rows), [TANGO_CHARS.index(token) for row in rows for token in row], constraints)
+
+    @classmethod
+    def from_grid(cls, grid):
+        # Queens colors are saved as region ids, Tango keeps the cells that are down to one state
+        cells = []
+        if isinstance(grid, QueensGrid):
+            for y in range(grid.height):
+                for x in range(grid.width):
+                    cells.append(grid.region_ids[x][y])
+            return cls('queens', grid.width, grid.height, cells)
+
+        for y in range(grid.height):
+            for x in range(grid.width):
+                states = grid.cells[x][y].states
+                cells.append(TANGO_CHARS.index(states[0].char) if len(states) == 1 else 0)
+        constraints = [(0, a, b) for a, b in grid.equals] + [(1, a, b) for a, b in grid.opposites]
+        return cls('tango', grid.width, grid.height, cells, constraints)
+
+    def to_text(self):
+        rows = [self.cells[y * self.width:(y + 1) * self.width] for y in range(self.height)]
+        if self.game == 'queens':
+            return '\n'.join(' '.join(str(value) for value in row) for row in rows) + '\n'
+
+        lines = [' '.join(TANGO_CHARS[value] for value in row) for row in rows]
+        for kind, (x1, y1), (x2, y2) in self.constraints:
+            lines.append(f'{CONSTRAINT_CHARS[kind]} {x1} {y1} {x2} {y2}')
+        return '\n'.join(lines) + '\n'
+
+    def to_grid(self, compact=False):
+        # Builds the grid straight from the bytes, without going through the text format
+        if self.game == 'queens':
+            grid = QueensGrid(self.width, self.height, compact)
+            colors = {}
+            for i, value in enumerate(self.cells):
+                color = colors.get(value)
+                if color is None:
+                    color = colors[value] = queens_color(value)
+                grid.cells[i % self.width][i // self.width].bg_col = color
+            grid.rebuild_regions()
+            return grid
+
+        grid = TangoGrid(self.width, self.height, compact)
+        for i, value in enumerate(self.cells):
+            if value:
+                grid.set_states(i % self.width, i // self.width, [SUN if value == 1 else MOON])
+        for kind, cell_a, cell_b in self.constraints:
+            if kind == 0:
+                grid.add_equal(cell_a, cell_b)
+            else:
+                grid.add_opposite(cell_a, cell_b)
+        return grid
+
+    def to_bytes(self):
+        parts = [RECORD.pack(self.width, self.height, len(self.constraints)), self.cells]
+        for kind, (x1, y1), (x2, y2) in self.constraints:
+            parts.append(CONSTRAINT.pack(kind, x1, y1, x2, y2))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, game, data):
+        width, height, constraint_count = RECORD.unpack_from(data, 0)
+        start = RECORD.size + width * height
+        constraints = []
+        for i in range(constraint_count):
+            kind, x1, y1, x2, y2 = CONSTRAINT.unpack_from(data, start + i * CONSTRAINT.size)
+            constraints.append((kind, (x1, y1), (x2, y2)))
+        return cls(game, width, height, data[RECORD.size:start], constraints)
+
+def write_pack(path, game, puzzles):
+    # Records are streamed to the file, the index goes after them once all the offsets are known
+    offsets = []
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, GAMES.index(game), 0, 0, 0))
+        for puzzle in puzzles:
+            if puzzle.game != game:
+                raise ValueError(f'Cannot put a {puzzle.game} puzzle in a {game} pack')
+            offsets.append(f.tell())
+            f.write(puzzle.to_bytes())
+
+        index_offset = f.tell()
+        offsets.append(index_offset)
+        f.write(b''.join(OFFSET.pack(offset) for offset in offsets))
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, GAMES.index(game), 0, len(offsets) - 1, index_offset))
+    return len(offsets) - 1
+
+class PuzzlePack:
+    # Read-only view of a pack through mmap: puzzle k is read from its two index entries without touching the rest.
+    # Processes mapping the same file share its pages
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.map) < HEADER.size:
+            raise ValueError(f'{path} is not a puzzle pack')
+        magic, version, game, _, self.count, self.index_offset = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a puzzle pack')
+        if version != VERSION:
+            raise ValueError(f'{path} is a version {version} pack, only version {VERSION} is supported')
+        self.game = GAMES[game]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError(f'Puzzle {k} is out of range, the pack has {self.count}')
+
+        start, end = OFFSETS.unpack_from(self.map, self.index_offset + k * OFFSET.size)
+        return Puzzle.from_bytes(self.game, self.map[start:end])
+
+    def __iter__(self):
+        for k in range(self.count):
+            yield self[k]
+
+    def grid(self, k, compact=False):
+        return self[k].to_grid(compact)
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_open_packs = {} # Path -> PuzzlePack, so a process maps each pack once
+
+def open_pack(path):
+    pack = _open_packs.get(path)
+    if pack is None:
+        pack = _open_packs[path] = PuzzlePack(path)
+    return pack
+
+def is_pack(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False # Reported when the file is loaded
+
+def load_puzzle(game, path, index=None, compact=False):
+    # Text config file, or puzzle `index` of a pack
+    if index is None:
+        with open(path, 'r') as f:
+            return Puzzle.from_text(game, f.read()).to_grid(compact)
+
+    pack = open_pack(path)
+    if pack.game != game:
+        raise ValueError(f'{path} holds {pack.game} puzzles, not {game}')
+    return pack.grid(index, compact)
+
+def main(argv=None):
+    from solver.batch import iter_paths
+
+    parser = argparse.ArgumentParser(prog='python -m solver.pack', description='Build puzzle packs from config files and export them back')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Pack text config files into one file')
+    build.add_argument('game', choices=GAMES)
+    build.add_argument('output')
+    build.add_argument('paths', nargs='+', help='Files, directories or glob patterns, e.g. "configs/queens/*"')
+
+    export = commands.add_parser('export', help='Write the puzzles of a pack back as text config files')
+    export.add_argument('pack')
+    export.add_argument('--index', type=int, help='Only this puzzle, printed to stdout')
+    export.add_argument('--output', help='Directory to write one file per puzzle to, named by index')
+
+    info = commands.add_parser('info', help='Print the game and size of a pack')
+    info.add_argument('pack')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        def puzzles():
+            for path in iter_paths(args.paths):
+                with open(path, 'r') as f:
+                    text = f.read()
+                try:
+                    yield Puzzle.from_text(args.game, text)
+                except ValueError as e:
+                    raise ValueError(f'Cannot pack {path}: {e}')
+
+        try:
+            count = write_pack(args.output, args.game, puzzles())
+        except ValueError as e:
+            os.remove(args.output) # Not a usable pack, the index is missing
+            parser.error(str(e))
+        print(f'{count} puzzles written to {args.output}', file=sys.stderr)
+        return 0
+
+    with PuzzlePack(args.pack) as pack:
+        if args.command == 'info':
+            print(f'{pack.game}: {len(pack)} puzzles, {os.path.getsize(args.pack)} bytes')
+        elif args.index is not None:
+            sys.stdout.write(pack[args.index].to_text())
+        elif args.output:
+            os.makedirs(args.output, exist_ok=True)
+            for k, puzzle in enumerate(pack):
+                with open(os.path.join(args.output, str(k)), 'w') as f:
+                    f.write(puzzle.to_text())
+        else:
+            sys.stdout.write('\n'.join(puzzle.to_text() for puzzle in pack))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from solver.grid import Cancelled, Grid, SolveResult
+
+# Set in each worker process by _init_worker, shared with the parent so running tasks can be stopped
+_cancel_event = None
+
+def _init_worker(cancel_event):
+    global _cancel_event
+    _cancel_event = cancel_event
+
+def _restore(snapshot):
+    grid = Grid.from_snapshot(snapshot)
+    grid.cancel = _cancel_event.is_set
+    return grid
+
+def _probe(snapshot, coords, state_index, recursion_depth):
+    # (True if collapsing the cell to this state leads to a contradiction or None if cancelled, worker stats)
+    grid = _restore(snapshot)
+    try:
+        grid.collapse(*coords, state_index)
+        grid.update_superpositions(recursion_depth, dirty=list(grid.peers(*coords)))
+    except Cancelled:
+        return None, grid.stats.as_dict()
+    return grid.has_contradiction(), grid.stats.as_dict()
+
+def _search(snapshot, limit, max_nodes, deadline):
+    grid = _restore(snapshot)
+    timeout = None if deadline is None else max(0, deadline - time.time())
+    try:
+        result = grid.search(limit, max_nodes, timeout)
+    except Cancelled:
+        return [], 0, False, grid.stats.as_dict()
+    return [solution.snapshot() for solution in result.solutions], result.nodes, result.exhausted, grid.stats.as_dict()
+
+class ParallelSolver:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.cancel_event = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.cancel_event,))
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def cancel(self, futures, stats):
+        # Stop the sibling tasks and wait for them so the event can be cleared for the next batch.
+        # The work they did until then still counts
+        for future in futures:
+            future.cancel()
+        self.cancel_event.set()
+        wait(futures)
+        self.cancel_event.clear()
+        for future in futures:
+            if not future.cancelled():
+                stats.merge(future.result()[-1])
+
+    def update_superpositions(self, grid, recursion_depth=20):
+        # Like Grid.update_superpositions, but the probes of several undecided cells run at the same time.
+        # The first refuted state is removed, the rest of the batch is cancelled and probing starts over
+        dirty = None
+        while grid.propagate(dirty):
+            candidates = [(x, y) for x, y in grid.iter_cell_coords() if len(grid.cells[x][y].states) > 1]
+            refuted = None
+
+            while candidates and refuted is None:
+                batch = candidates[:max(1, self.workers // 2)]
+                candidates = candidates[len(batch):]
+                snapshot = grid.snapshot()
+
+                futures = {}
+                for coords in batch:
+                    for state_index in range(len(grid.cells[coords[0]][coords[1]].states)):
+                        future = self.executor.submit(_probe, snapshot, coords, state_index, recursion_depth - 1)
+                        futures[future] = (coords, state_index)
+
+                pending = set(futures)
+                while pending and refuted is None:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        contradiction, stats = future.result()
+                        grid.stats.merge(stats)
+                        if contradiction and refuted is None:
+                            refuted = futures[future]
+
+                if pending:
+                    self.cancel(pending, grid.stats)
+
+            if refuted is None:
+                return
+
+            coords, state_index = refuted
+            grid.set_states(*coords, [state for i, state in enumerate(grid.cells[coords[0]][coords[1]].states) if i != state_index])
+            dirty = list(grid.peers(*coords))
+
+    def split(self, grid, count):
+        # Expand the search tree breadth-first until there are enough independent subtrees.
+        # Solutions and contradictions met on the way are resolved here
+        work = grid.clone()
+        frontier = [work.snapshot()]
+        solutions = []
+        nodes = 0
+
+        while frontier and len(frontier) < count:
+            work = Grid.from_snapshot(frontier.pop(0))
+            work.stats = grid.stats
+            nodes += 1
+            if not work.propagate():
+                continue
+
+            coords = work.select_branch_cell()
+            if coords is None:
+                solutions.append(work)
+                continue
+
+            for state in work.cells[coords[0]][coords[1]].states:
+                mark = work.checkpoint()
+                work.set_states(*coords, [state])
+                frontier.append(work.snapshot())
+                work.rollback(mark)
+
+        return frontier, solutions, nodes
+
+    def search(self, grid, limit=1, max_nodes=None, timeout=None):
+        # Grid.search with the top-level subtrees explored by the pool. max_nodes applies to each subtree
+        result = SolveResult(limit)
+        start = time.perf_counter()
+        deadline = None if timeout is None else time.time() + timeout
+
+        subtrees, result.solutions, result.nodes = self.split(grid, 4 * self.workers)
+        result.exhausted = True
+
+        futures = [self.executor.submit(_search, subtree, limit, max_nodes, deadline) for subtree in subtrees]
+        pending = set(futures)
+        while pending and len(result.solutions) < limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                solutions, nodes, exhausted, stats = future.result()
+                grid.stats.merge(stats)
+                result.solutions += [Grid.from_snapshot(solution) for solution in solutions]
+                result.nodes += nodes
+                result.exhausted = result.exhausted and exhausted
+
+        if pending:
+            self.cancel(pending, grid.stats)
+
+        # Like Grid.search, reaching the limit means the rest of the space wasn't explored
+        if len(result.solutions) >= limit:
+            result.exhausted = False
+        result.solutions = result.solutions[:limit]
+        result.seconds = time.perf_counter() - start
+        result.stats = grid.stats
+        return result
@@ -0,0 +1,437 @@
+import colorsys
+from array import array
+
+from solver.grid import Grid, State
+
+class EmptyState(State):
+    def __init__(self):
+        super().__init__('EMPTY', '.')
+
+    def is_possible(self, grid, cell_x, cell_y):
+        # Check if all other cells of this color are empty
+        possible = grid.region_possible[grid.region_ids[cell_x][cell_y]]
+        if grid.can_be(cell_x, cell_y, CROWN.name):
+            possible -= 1
+
+        return possible > 0
+
+class CrownState(State):
+    def __init__(self):
+        super().__init__('QUEEN', 'Q')
+
+    def is_possible(self, grid, cell_x, cell_y):
+        # Queens of the same row, column or color, not counting this cell
+        this_queen = 1 if grid.must_be(cell_x, cell_y, self.name) else 0
+
+        # Check if there is a queen in the same row or column
+        if grid.row_placed[cell_y] > this_queen or grid.col_placed[cell_x] > this_queen:
+            return False
+
+        # Check if there is a queen in the 8 cells around this cell
+        for x in range(cell_x - 1, cell_x + 2):
+            for y in range(cell_y - 1, cell_y + 2):
+                if x == cell_x and y == cell_y:
+                    continue
+
+                if grid.must_be(x, y, self.name):
+                    return False
+
+        # Check if there is a queen on a cell with the same color
+        if grid.region_placed[grid.region_ids[cell_x][cell_y]] > this_queen:
+            return False
+
+        return True
+
+
+CROWN = CrownState()
+EMPTY = EmptyState()
+
+QUEENS_COLORS = {
+    'RED': (255, 0, 0),
+    'BLUE': (0, 0, 255),
+    'GREEN': (0, 255, 0),
+    'YELLOW': (255, 255, 0),
+    'PURPLE': (255, 0, 255),
+    'ORANGE': (255, 165, 0),
+    'CYAN': (0, 255, 255),
+    'PINK': (255, 192, 203),
+    'BROWN': (165, 42, 42),
+}
+
+def queens_color(index):
+    # Boards with more regions than named colors get evenly spread hues
+    color_list = list(QUEENS_COLORS.values())
+    if index < len(color_list):
+        return color_list[index]
+
+    r, g, b = colorsys.hsv_to_rgb((index * 0.618034) % 1, 0.5, 0.9)
+    return int(r * 255), int(g * 255), int(b * 255)
+
+class QueensGrid(Grid):
+    def __init__(self, width, height, compact=False):
+        super().__init__(width, height, (200, 200, 200), [CROWN, EMPTY], compact)
+        self.rebuild_regions()
+
+    def rebuild_regions(self):
+        # Regions are numbered by first appearance of their color. The id map and cell lists are
+        # shared with clones, so they are replaced rather than modified in place
+        ids_by_color = {}
+        self.region_ids = [[0] * self.height for _ in range(self.width)]
+        self.region_cells = []
+        for y in range(self.height):
+            for x in range(self.width):
+                color = self.cells[x][y].bg_col
+                if color not in ids_by_color:
+                    ids_by_color[color] = len(self.region_cells)
+                    self.region_cells.append([])
+
+                self.region_ids[x][y] = ids_by_color[color]
+                self.region_cells[ids_by_color[color]].append((x, y))
+
+        self.attacks = None # Built by attack_masks() when first needed
+        self.recount()
+
+    def recount(self):
+        # Live number of cells that can hold ("possible") or must hold ("placed") a queen per region, row and column
+        self.region_possible = [0] * len(self.region_cells)
+        self.region_placed = [0] * len(self.region_cells)
+        self.row_possible = [0] * self.height
+        self.row_placed = [0] * self.height
+        self.col_possible = [0] * self.width
+        self.col_placed = [0] * self.width
+
+        for x, y in self.iter_cell_coords():
+            self.count_queens(x, y, self.states_at(x, y), 1)
+
+    def count_queens(self, x, y, states, delta):
+        possible = False
+        for state in states:
+            if state.name == CROWN.name:
+                possible = True
+
+        if not possible:
+            return
+
+        region = self.region_ids[x][y]
+        self.region_possible[region] += delta
+        self.row_possible[y] += delta
+        self.col_possible[x] += delta
+
+        if len(states) == 1:
+            self.region_placed[region] += delta
+            self.row_placed[y] += delta
+            self.col_placed[x] += delta
+
+    def infer(self):
+        # Set reasoning over the cells that can still hold a queen
+        crown = CROWN.name
+        candidates = [(x, y) for x, y in self.iter_cell_coords() if self.can_be(x, y, crown)]
+
+        # Every region needs its own row and its own column. When there are as many regions as lines,
+        # every row also needs its own column. Edges that no such matching uses can't hold a queen
+        region_rows = [set() for _ in self.region_cells]
+        region_cols = [set() for _ in self.region_cells]
+        row_cols = [set() for _ in range(self.height)]
+        for x, y in candidates:
+            region = self.region_ids[x][y]
+            region_rows[region].add(y)
+            region_cols[region].add(x)
+            row_cols[y].add(x)
+
+        every_line = len(self.region_cells) == self.width == self.height
+        supported_rows = matching_support(region_rows, self.height)
+        supported_cols = matching_support(region_cols, self.width)
+        supported_row_cols = matching_support(row_cols, self.width) if every_line else None
+        if supported_rows is None or supported_cols is None or every_line and supported_row_cols is None:
+            self.empty_unmatched(region_rows, region_cols, row_cols if every_line else None)
+            return None
+
+        changed = []
+        for x, y in candidates:
+            region = self.region_ids[x][y]
+            if y not in supported_rows[region] or x not in supported_cols[region] or every_line and x not in supported_row_cols[y]:
+                if not self.remove_crown(x, y, changed, 'matching'):
+                    return None
+
+        # A queen on a cell that sees every candidate of a region (or line) would leave it empty.
+        # Cells are bits of y * width + x
+        attacks = self.attack_masks()
+        units = [[] for _ in self.region_cells]
+        if every_line:
+            units += [[] for _ in range(self.width + self.height)]
+        candidate_mask = 0
+        for x, y in candidates:
+            if self.can_be(x, y, crown):
+                index = y * self.width + x
+                candidate_mask |= 1 << index
+                units[self.region_ids[x][y]].append(index)
+                if every_line:
+                    units[len(self.region_cells) + y].append(index)
+                    units[len(self.region_cells) + self.height + x].append(index)
+
+        for unit in units:
+            if not unit:
+                continue
+
+            common = candidate_mask
+            for index in unit:
+                common &= attacks[index]
+                if not common:
+                    break
+
+            while common:
+                bit = common & -common
+                common ^= bit
+                index = bit.bit_length() - 1
+                if not self.remove_crown(index % self.width, index // self.width, changed, 'wipe-out'):
+                    return None
+                candidate_mask &= ~bit
+
+        return changed
+
+    def empty_unmatched(self, region_rows, region_cols, row_cols):
+        # No matching: empties the cells of the regions (or rows) that can't all get their own line, the contradiction
+        # is theirs. Their queen candidates if they have any, otherwise every cell of them
+        for adjacency, count, units in ((region_rows, self.height, self.region_cells), (region_cols, self.width, self.region_cells),
+                                        (row_cols, self.width, [[(x, y) for x in range(self.width)] for y in range(self.height)])):
+            unmatched = unmatched_lefts(adjacency, count) if adjacency is not None else None
+            if unmatched is None:
+                continue
+            cells = [cell for unit in unmatched for cell in units[unit]]
+            crowns = [(x, y) for x, y in cells if self.can_be(x, y, CROWN.name)]
+            for x, y in crowns or cells:
+                self.prune(x, y, [], 'matching')
+            return
+
+    def remove_crown(self, x, y, changed, rule):
+        # False if the cell had to be a queen
+        kept = [state for state in self.states_at(x, y) if state.name != CROWN.name]
+        self.prune(x, y, kept, rule)
+        changed.append((x, y))
+        return len(kept) > 0
+
+    def attack_masks(self):
+        # Bitmask per cell index of the cells a queen there rules out: same row, column or region, and the 8 around it
+        if self.attacks is None:
+            self.attacks = [0] * (self.width * self.height)
+            for x, y in self.iter_cell_coords():
+                mask = 0
+                for other_x, other_y in self.peers(x, y):
+                    if (other_x, other_y) != (x, y):
+                        mask |= 1 << (other_y * self.width + other_x)
+                self.attacks[y * self.width + x] = mask
+        return self.attacks
+
+    def set_states(self, x, y, states):
+        self.count_queens(x, y, self.states_at(x, y), -1)
+        super().set_states(x, y, states)
+        self.count_queens(x, y, states, 1)
+
+    def branch_priority(self, x, y):
+        # Most constrained region (or line) first
+        return min(self.region_possible[self.region_ids[x][y]], self.row_possible[y], self.col_possible[x])
+
+    def snapshot_extra(self):
+        return tuple(self.cells[x][y].bg_col for x, y in self.iter_cell_coords())
+
+    def key_extra(self):
+        # Region ids are numbered by first appearance, so boards that only differ by colors share a key
+        return array('H', [self.region_ids[x][y] for y in range(self.height) for x in range(self.width)]).tobytes()
+
+    def load_snapshot_extra(self, extra):
+        for (x, y), color in zip(self.iter_cell_coords(), extra):
+            self.cells[x][y].bg_col = color
+        self.rebuild_regions()
+
+    def paint(self, x, y, color):
+        self.cells[x][y].bg_col = color
+        self.rebuild_regions()
+
+    def reset(self):
+        super().reset()
+        self.rebuild_regions()
+
+    def peers(self, x, y):
+        # Rules read the row, the column, the 8 surrounding cells and the cells of the same color
+        for other_x in range(self.width):
+            if other_x != x:
+                yield other_x, y
+
+        for other_y in range(self.height):
+            if other_y != y:
+                yield x, other_y
+
+        for other_x in range(max(0, x - 1), min(self.width, x + 2)):
+            for other_y in range(max(0, y - 1), min(self.height, y + 2)):
+                if other_x != x and other_y != y:
+                    yield other_x, other_y
+
+        for other_x, other_y in self.region_cells[self.region_ids[x][y]]:
+            if (other_x, other_y) != (x, y):
+                yield other_x, other_y
+
+    def clone(self):
+        copy = QueensGrid(self.width, self.height, self.compact)
+
+        copy.is_original = False
+        copy.stats = self.stats
+        copy.stats.clones += 1
+        copy.cache = self.cache
+
+        self.copy_states_to(copy)
+        self.copy_colors_to(copy)
+
+        copy.region_ids = self.region_ids
+        copy.region_cells = self.region_cells
+        copy.attacks = self.attacks
+        copy.region_possible = list(self.region_possible)
+        copy.region_placed = list(self.region_placed)
+        copy.row_possible = list(self.row_possible)
+        copy.row_placed = list(self.row_placed)
+        copy.col_possible = list(self.col_possible)
+        copy.col_placed = list(self.col_placed)
+
+        return copy
+
+def matching_support(adjacency, right_count):
+    # adjacency[left] is the set of right vertices it can be matched with. Returns, for every left vertex, the right
+    # vertices it is matched with in at least one matching that covers all left vertices, or None if there is none
+    match_right = [None] * right_count
+    match_left = [None] * len(adjacency)
+    for left in range(len(adjacency)):
+        if not augment(adjacency, match_left, match_right, left, set()):
+            return None
+
+    # Unmatched edges point from left to right, matched edges from right to left. An unmatched edge (left, right)
+    # can be swapped in if right leads back to left (alternating cycle) or to a free right vertex (alternating path)
+    node_count = len(adjacency) + right_count
+    edges = [[] for _ in range(node_count)]
+    for left, rights in enumerate(adjacency):
+        for right in rights:
+            if match_left[left] == right:
+                edges[len(adjacency) + right].append(left)
+            else:
+                edges[left].append(len(adjacency) + right)
+
+    # Right vertices that can reach a free right vertex
+    reverse = [[] for _ in range(node_count)]
+    for node, targets in enumerate(edges):
+        for target in targets:
+            reverse[target].append(node)
+    free = [len(adjacency) + right for right in range(right_count) if match_right[right] is None]
+    reaches_free = set(free)
+    stack = list(free)
+    while stack:
+        for source in reverse[stack.pop()]:
+            if source not in reaches_free:
+                reaches_free.add(source)
+                stack.append(source)
+
+    components = strongly_connected_components(edges)
+    support = []
+    for left, rights in enumerate(adjacency):
+        support.append({right for right in rights if match_left[left] == right
+                        or components[left] == components[len(adjacency) + right]
+                        or len(adjacency) + right in reaches_free})
+    return support
+
+def augment(adjacency, match_left, match_right, left, visited):
+    # Looks for an alternating path from left to a free right vertex and swaps the matching along it. On failure,
+    # visited holds every right vertex the path could reach
+    for right in adjacency[left]:
+        if right in visited:
+            continue
+        visited.add(right)
+        if match_right[right] is None or augment(adjacency, match_left, match_right, match_right[right], visited):
+            match_right[right] = left
+            match_left[left] = right
+            return True
+    return False
+
+def unmatched_lefts(adjacency, right_count):
+    # Left vertices that can't all be matched, as they only reach fewer right vertices than there are of them.
+    # None if every left vertex can be matched
+    match_right = [None] * right_count
+    match_left = [None] * len(adjacency)
+    for left in range(len(adjacency)):
+        visited = set()
+        if not augment(adjacency, match_left, match_right, left, visited):
+            return {left} | {match_right[right] for right in visited}
+    return None
+
+def strongly_connected_components(edges):
+    # Iterative Tarjan, returns a component id per node
+    index_of = [None] * len(edges)
+    lowlink = [0] * len(edges)
+    component = [None] * len(edges)
+    stack = []
+    on_stack = [False] * len(edges)
+    counter = 0
+    component_count = 0
+
+    for start in range(len(edges)):
+        if index_of[start] is not None:
+            continue
+
+        work = [(start, 0)]
+        while work:
+            node, next_edge = work.pop()
+            if next_edge == 0:
+                index_of[node] = lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+
+            recursed = False
+            for i in range(next_edge, len(edges[node])):
+                target = edges[node][i]
+                if index_of[target] is None:
+                    work.append((node, i + 1))
+                    work.append((target, 0))
+                    recursed = True
+                    break
+                if on_stack[target]:
+                    lowlink[node] = min(lowlink[node], index_of[target])
+            if recursed:
+                continue
+
+            if lowlink[node] == index_of[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = component_count
+                    if member == node:
+                        break
+                component_count += 1
+
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+    return component
+
+# Config format: one line per row of whitespace-separated colour indices (see queens_color)
+def read_queens(text):
+    # Rows of color indices
+    rows = [[int(token) for token in line.split()] for line in text.splitlines() if line.strip()]
+    if not rows or any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError('Rows must all have the same length')
+    if any(value < 0 for row in rows for value in row):
+        raise ValueError('Color indices cannot be negative')
+    return rows
+
+def parse_queens(text, grid=None, compact=False):
+    rows = read_queens(text)
+    if grid is None:
+        grid = QueensGrid(len(rows[0]), len(rows), compact)
+
+    for y, row in enumerate(rows):
+        for x, col_idx in enumerate(row):
+            grid.cells[x][y].bg_col = queens_color(col_idx)
+
+    grid.rebuild_regions()
+    return grid
+
+def load_queens(path, grid=None, compact=False):
+    with open(path, 'r') as f:
+        return parse_queens(f.read(), grid, compact)
@@ -0,0 +1,283 @@
+import argparse
+import os
+import sys
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError: # NumPy is only needed to import screenshots
+    np = None
+
+from solver.queens import QueensGrid
+from solver.tango import MOON, SUN, TangoGrid
+
+ASSETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets')
+SIZES = range(4, 21) # Board sizes looked for
+SYMBOL_INSET = 0.1 # The UI draws symbols 8 px inside an 80 px cell
+SUPERSAMPLE = 3 # Pixels averaged along each axis per sample, so thin strokes aren't missed between samples
+MATCH_THRESHOLD = 0.4 # Normalized cross-correlation needed to accept a template
+INK_THRESHOLD = 4 # Mean color distance from the background below which a patch is empty
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('Importing screenshots needs numpy (pip install numpy)')
+
+def read_image(path):
+    # RGB array of shape (height, width, 3). pygame is already needed by the UI and decodes PNG
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    import pygame
+    surface = pygame.image.load(path)
+    width, height = surface.get_size()
+    return np.frombuffer(pygame.image.tobytes(surface, 'RGB'), dtype=np.uint8).reshape(height, width, 3)
+
+def edge_profile(gray, axis):
+    # Mean brightness change between neighbouring columns (axis 1) or rows (axis 0), peaks on the grid lines
+    return np.abs(np.diff(gray, axis=axis)).mean(axis=1 - axis)
+
+def profile_bounds(profile):
+    # Inside edges of the outer border: a border line gives a run of close peaks on each side of the board
+    strong = np.flatnonzero(profile > 0.3 * profile.max())
+    gaps = np.flatnonzero(np.diff(strong) > max(3, len(profile) // 50))
+    if len(gaps) == 0:
+        return int(strong[0]), int(strong[-1]) + 1 # No border, the board fills the image
+    return int(strong[gaps[0]]) + 1, int(strong[gaps[-1] + 1]) + 1
+
+def line_score(profile, start, end, size):
+    # How much more the profile peaks on the lines of a size x size grid than halfway between them
+    spacing = (end - start) / size
+    tolerance = max(1, int(spacing * 0.06))
+    windows = np.arange(-tolerance, tolerance + 1)
+
+    def peaks(positions):
+        indices = np.clip(np.rint(positions).astype(int)[:, None] + windows, 0, len(profile) - 1)
+        return profile[indices].max(axis=1).mean()
+
+    return peaks(start + np.arange(1, size) * spacing) - peaks(start + (np.arange(size) + 0.5) * spacing)
+
+def fit_size(columns, rows, bounds, sizes):
+    # The size whose lines line up best with the brightness changes. A grid of a third of the size scores about as
+    # well, so larger sizes win near-ties
+    left, top, right, bottom = bounds
+    scores = [(line_score(columns, left, right, size) + line_score(rows, top, bottom, size), size) for size in sizes]
+    best = max(score for score, _ in scores)
+    return max(size for score, size in scores if score >= 0.85 * best)
+
+def frameless(gray, columns, rows, bounds):
+    # True if the board runs past the bounds to the edges of the image. Without a frame the bounds found are inner
+    # lines, and the lines across the board carry on into the margins outside them: the edges in a margin line up with
+    # those of the board. With a frame the margins are background, or anything but the grid. Margins of a few pixels
+    # are the frame itself
+    left, top, right, bottom = bounds
+    margins = [(gray[top:bottom, :left], 0), (gray[top:bottom, right:], 0), (gray[:top, left:right], 1), (gray[bottom:, left:right], 1)]
+    margins = [(margin, axis) for margin, axis in margins if margin.shape[1 - axis] > 3]
+    if not margins:
+        return False
+
+    for margin, axis in margins:
+        edges = edge_profile(margin, axis).astype(np.float64)
+        board = (rows[top:] if axis == 0 else columns[left:]).astype(np.float64)[:len(edges)]
+        board, edges = board - board.mean(), edges - edges.mean()
+        norm = np.sqrt((board * board).sum() * (edges * edges).sum())
+        if not norm or (board * edges).sum() / norm < 0.2:
+            return False
+    return True
+
+def find_grid(image, sizes=SIZES):
+    # Board bounds (left, top, right, bottom) and size. The outer border gives the bounds, or the edges of the image
+    # for a crop without a frame
+    gray = ((image[:, :, 0] * np.uint16(77) + image[:, :, 1] * np.uint16(150) + image[:, :, 2] * np.uint16(29)) >> 8).astype(np.int16)
+    columns = edge_profile(gray, 1)
+    rows = edge_profile(gray, 0)
+    left, right = profile_bounds(columns)
+    top, bottom = profile_bounds(rows)
+    bounds = (left, top, right, bottom)
+    if frameless(gray, columns, rows, bounds):
+        bounds = (0, 0, image.shape[1], image.shape[0])
+    return bounds, fit_size(columns, rows, bounds, sizes)
+
+def sample_cells(image, bounds, size, samples, inset):
+    # samples x samples pixels from the inside of every cell, as an array of shape (size, size, samples, samples, 3)
+    # indexed by row then column
+    left, top, right, bottom = bounds
+    offsets = inset + (1 - 2 * inset) * (np.arange(samples) + 0.5) / samples
+
+    def coords(start, end):
+        spacing = (end - start) / size
+        return np.rint(start + (np.arange(size)[:, None] + offsets) * spacing).astype(int).reshape(-1)
+
+    patches = image[coords(top, bottom)[:, None], coords(left, right)]
+    return patches.reshape(size, samples, size, samples, 3).transpose(0, 2, 1, 3, 4)
+
+def pool(patches, factor):
+    # Averages factor x factor blocks of the two sample axes before the color axis
+    *outer, rows, columns, channels = patches.shape
+    blocks = patches.reshape(*outer, rows // factor, factor, columns // factor, factor, channels)
+    total = np.zeros((*outer, rows // factor, columns // factor, channels), dtype=np.float32)
+    for i in range(factor):
+        for j in range(factor):
+            total += blocks[..., i, :, j, :] # Much faster than a mean over two strided axes
+    return total / (factor * factor)
+
+def cluster_colors(colors, count, threshold=30):
+    # Labels colors that are within `threshold` of each other, through chains of colors, then merges the closest
+    # clusters while there are more than `count`. Labels are numbered by first appearance
+    colors = colors.astype(np.float32)
+    close = np.linalg.norm(colors[:, None] - colors[None, :], axis=2) < threshold
+
+    labels = np.arange(len(colors))
+    while True:
+        spread = np.where(close, labels[None, :], len(colors)).min(axis=1)
+        if np.array_equal(spread, labels):
+            break
+        labels = spread
+
+    clusters = [np.flatnonzero(labels == label) for label in np.unique(labels)]
+    while len(clusters) > count:
+        centers = np.array([colors[members].mean(axis=0) for members in clusters])
+        distances = np.linalg.norm(centers[:, None] - centers[None, :], axis=2)
+        np.fill_diagonal(distances, np.inf)
+        a, b = sorted(np.unravel_index(np.argmin(distances), distances.shape))
+        clusters[a] = np.concatenate([clusters[a], clusters.pop(b)])
+
+    clusters.sort(key=lambda members: members.min())
+    labels = np.empty(len(colors), dtype=int)
+    for label, members in enumerate(clusters):
+        labels[members] = label
+    centers = [tuple(int(c) for c in np.rint(colors[members].mean(axis=0))) for members in clusters]
+    return labels, centers
+
+def import_queens(image, compact=False):
+    # Regions come from the median color of each cell, the middle is left out in case it holds a crown or a mark
+    _require_numpy()
+    bounds, size = find_grid(image)
+    patches = sample_cells(image, bounds, size, 8, 0.1)
+    ring = np.ones((8, 8), dtype=bool)
+    ring[2:6, 2:6] = False
+    colors = np.median(patches[:, :, ring], axis=2).reshape(-1, 3)
+
+    labels, centers = cluster_colors(colors, size)
+    grid = QueensGrid(size, size, compact)
+    for i, label in enumerate(labels):
+        grid.cells[i % size][i // size].bg_col = centers[label]
+    grid.rebuild_regions()
+    return grid
+
+@lru_cache(maxsize=None)
+def symbol_template(name, samples):
+    # Alpha of assets/<name>.png at the resolution cells are sampled at, zero mean and unit norm
+    import pygame
+    surface = pygame.image.load(os.path.join(ASSETS, name + '.png'))
+    width, height = surface.get_size()
+    alpha = np.frombuffer(pygame.image.tobytes(surface, 'RGBA'), dtype=np.uint8).reshape(height, width, 4)[:, :, 3]
+    points = samples * SUPERSAMPLE
+    rows = ((np.arange(points) + 0.5) * height / points).astype(int)
+    columns = ((np.arange(points) + 0.5) * width / points).astype(int)
+    return normalized(pool(alpha[rows[:, None], columns, None], SUPERSAMPLE).reshape(-1))
+
+@lru_cache(maxsize=None)
+def marker_templates(samples, horizontal):
+    # '=' and 'x' drawn across the middle 70% of a patch centered on the line between two cells. The assets have no
+    # pictures of them, so they are drawn here. The band over the grid line is masked out of the comparison
+    u, v = np.meshgrid(np.linspace(-1, 1, samples), np.linspace(-1, 1, samples))
+    inside = (np.abs(u) < 0.7) & (np.abs(v) < 0.7)
+    equals = inside & ((np.abs(v - 0.3) < 0.12) | (np.abs(v + 0.3) < 0.12))
+    cross = inside & ((np.abs(u - v) < 0.17) | (np.abs(u + v) < 0.17))
+    mask = np.abs(u if horizontal else v) > 0.15
+    return mask, [normalized(template[mask].astype(np.float32)) for template in (equals, cross)]
+
+def normalized(vectors):
+    # Zero mean, unit norm along the last axis, so a dot product is the correlation
+    vectors = vectors - vectors.mean(axis=-1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def ink(patches):
+    # Distance of every pixel from the patch background (its median color)
+    patches = patches.astype(np.float32)
+    background = np.median(patches.reshape(*patches.shape[:-3], -1, 3), axis=-2)
+    return np.linalg.norm(patches - background[..., None, None, :], axis=-1)
+
+def match(features, templates):
+    # Index of the best template for every patch, or -1 when none matches or the patch is empty
+    flat = features.reshape(len(features), -1)
+    scores = normalized(flat) @ np.array(templates).T
+    found = (scores.max(axis=1) > MATCH_THRESHOLD) & (flat.mean(axis=1) > INK_THRESHOLD)
+    return np.where(found, scores.argmax(axis=1), -1)
+
+def edge_patches(image, bounds, size, samples, horizontal):
+    # Patches a quarter of a cell wide centered on the middle of every line between two cells, to the left and right
+    # of each other or above each other
+    left, top, right, bottom = bounds
+    spacing_x = (right - left) / size
+    spacing_y = (bottom - top) / size
+    if horizontal:
+        centers_x = left + np.arange(1, size) * spacing_x
+        centers_y = top + (np.arange(size) + 0.5) * spacing_y
+    else:
+        centers_x = left + (np.arange(size) + 0.5) * spacing_x
+        centers_y = top + np.arange(1, size) * spacing_y
+
+    points = samples * SUPERSAMPLE
+    offsets = (np.arange(points) + 0.5) / points - 0.5
+    xs = np.rint(centers_x[:, None] + offsets * spacing_x / 4).astype(int).reshape(-1)
+    ys = np.rint(centers_y[:, None] + offsets * spacing_y / 4).astype(int).reshape(-1)
+    patches = image[ys[:, None], xs].reshape(len(centers_y), points, len(centers_x), points, 3).transpose(0, 2, 1, 3, 4)
+    return pool(patches.reshape(-1, points, points, 3), SUPERSAMPLE)
+
+def import_tango(image, compact=False):
+    # Suns and moons are matched against the assets, '=' and 'x' on the lines between cells against drawn markers
+    _require_numpy()
+    bounds, size = find_grid(image)
+    grid = TangoGrid(size, size, compact)
+
+    samples = 24
+    patches = pool(sample_cells(image, bounds, size, samples * SUPERSAMPLE, SYMBOL_INSET), SUPERSAMPLE)
+    found = match(ink(patches).reshape(size * size, -1), [symbol_template('sun', samples), symbol_template('moon', samples)])
+    for i, symbol in enumerate(found):
+        if symbol >= 0:
+            grid.set_states(i % size, i // size, [SUN if symbol == 0 else MOON])
+
+    samples = 16
+    for horizontal in (True, False):
+        mask, templates = marker_templates(samples, horizontal)
+        features = ink(edge_patches(image, bounds, size, samples, horizontal))[:, mask]
+        columns = size - 1 if horizontal else size
+        for i, marker in enumerate(match(features, templates)):
+            if marker < 0:
+                continue
+            y, x = divmod(i, columns)
+            cell_b = (x + 1, y) if horizontal else (x, y + 1)
+            if marker == 0:
+                grid.add_equal((x, y), cell_b)
+            else:
+                grid.add_opposite((x, y), cell_b)
+    return grid
+
+IMPORTERS = {
+    'queens': import_queens,
+    'tango': import_tango,
+}
+
+def load_screenshot(game, path, compact=False):
+    _require_numpy()
+    return IMPORTERS[game](read_image(path), compact)
+
+def main(argv=None):
+    from solver.pack import Puzzle
+
+    parser = argparse.ArgumentParser(prog='python -m solver.screenshot', description='Turn a screenshot of a board into a config file')
+    parser.add_argument('game', choices=sorted(IMPORTERS))
+    parser.add_argument('image', help='PNG screenshot cropped around the board')
+    parser.add_argument('--output', help='Write the config to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    text = Puzzle.from_grid(load_screenshot(args.game, args.image)).to_text()
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
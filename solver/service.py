@@ -0,0 +1,396 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from solver.batch import LOADERS, solve_grid
+from solver.cache import SolveCache
+from solver.pack import Puzzle
+
+# Long-running solver behind HTTP, on localhost or a Unix socket:
+#   POST /solve  one puzzle as JSON, or a list of them, answered with the same records as python -m solver.batch
+#   GET /stats   request counts, queue depth, batch sizes and latency percentiles
+# A puzzle is {"game": "queens", "puzzle": "<text of a config file>"}, or "rows" (strings or lists of tokens, as in
+# the config files) and for Tango "constraints" ([["=", x1, y1, x2, y2], ...]). Optional: "mode" (unique, search or
+# lookahead, as in solver.batch) and "id", echoed back
+MODES = ('unique', 'search', 'lookahead')
+MAX_BODY = 1024 * 1024
+
+# Set in each worker process by _init_worker
+_cache = None
+
+def _init_worker(cache_bytes):
+    # Imports, class tables and the first solve of each game are paid here instead of on the first request
+    global _cache
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl+C stops the server, which shuts the pool down
+    from solver.generate import random_queens, random_tango
+    random_queens(8, 0).search(2)
+    random_tango(6, 0).search(2)
+    _cache = SolveCache(cache_bytes) if cache_bytes else None
+
+def _solve_batch(items):
+    # One round trip to the pool for several puzzles
+    records = []
+    for puzzle, mode in items:
+        start = time.perf_counter()
+        record = {'game': puzzle.game}
+        try:
+            grid = puzzle.to_grid()
+            grid.cache = _cache # Keyed by the whole board, so puzzles seen before are lookups
+            records.append(solve_grid(grid, mode, record, start))
+        except Exception as e: # Only this puzzle fails, not the ones batched with it
+            record.update(status='error', error=repr(e), seconds=time.perf_counter() - start)
+            records.append(record)
+    return records
+
+def parse_request(data):
+    # (Puzzle, mode), or ValueError with a message for the client
+    if not isinstance(data, dict):
+        raise ValueError('A puzzle must be a JSON object')
+    game = data.get('game')
+    if game not in LOADERS:
+        raise ValueError(f'Unknown game {game!r}, expected one of {", ".join(sorted(LOADERS))}')
+    mode = data.get('mode', 'unique')
+    if mode not in MODES:
+        raise ValueError(f'Unknown mode {mode!r}, expected one of {", ".join(MODES)}')
+
+    if 'puzzle' in data:
+        text = data['puzzle']
+    elif 'rows' in data:
+        lines = [row if isinstance(row, str) else ' '.join(str(token) for token in row) for row in data['rows']]
+        lines += [' '.join(str(token) for token in constraint) for constraint in data.get('constraints', ())]
+        text = '\n'.join(lines)
+    else:
+        raise ValueError('Expected "puzzle" or "rows"')
+
+    # Cells, constraint coordinates (on the board, between neighbours) and row lengths are checked here,
+    # so malformed puzzles are answered with a 400 and never reach the pool
+    try:
+        return Puzzle.from_text(game, text), mode
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Bad {game} puzzle: {e}') from None
+
+class Request:
+    def __init__(self, puzzle, mode):
+        self.puzzle = puzzle
+        self.mode = mode
+        self.arrived = time.perf_counter()
+        self.dispatched = None
+        self.record = None
+        self.done = threading.Event()
+
+class ServiceStats:
+    # Counters of the service, latencies are kept for the last `window` requests
+    def __init__(self, window=10000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0 # Rejected before reaching the pool
+        self.batches = 0
+        self.batched = 0 # Requests sent in those batches
+        self.queue_depth = 0 # Accepted and not answered yet
+        self.max_queue_depth = 0
+        self.latencies = deque(maxlen=window) # Seconds from arrival to answer
+        self.waits = deque(maxlen=window) # Seconds spent waiting for a batch
+
+    def accepted(self):
+        with self.lock:
+            self.requests += 1
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def rejected(self):
+        with self.lock:
+            self.requests += 1
+            self.errors += 1
+
+    def dispatched(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batched += size
+
+    def answered(self, request):
+        with self.lock:
+            self.queue_depth -= 1
+            self.latencies.append(time.perf_counter() - request.arrived)
+            self.waits.append(request.dispatched - request.arrived)
+
+    def as_dict(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            waits = sorted(self.waits)
+            return {
+                'uptime': time.time() - self.started,
+                'requests': self.requests,
+                'errors': self.errors,
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'mean_batch': self.batched / self.batches if self.batches else 0,
+                'latency_ms': percentiles(latencies),
+                'wait_ms': percentiles(waits),
+            }
+
+def percentiles(values):
+    if not values:
+        return {}
+    pick = lambda p: values[min(len(values) - 1, int(p * len(values)))] * 1000
+    return {'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'max': values[-1] * 1000}
+
+class SolverService:
+    # Requests are queued and a dispatcher thread sends them to the pool in batches: whatever arrived within
+    # `batch_wait` seconds of the first one, up to `batch_size`. At most `workers` batches are in flight, the rest
+    # waits in the queue so a burst is batched instead of piling up in the pool
+    def __init__(self, workers=None, batch_size=16, batch_wait=0.002, cache_bytes=16 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.stats = ServiceStats()
+        self.queue = queue.Queue()
+        self.slots = threading.Semaphore(self.workers)
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(cache_bytes,))
+        # Starts every worker now, each one warms up while the server is coming up
+        for future in [self.executor.submit(_solve_batch, []) for _ in range(self.workers)]:
+            future.result()
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, puzzle, mode):
+        request = Request(puzzle, mode)
+        self.stats.accepted()
+        self.queue.put(request)
+        return request
+
+    def dispatch(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    request = self.queue.get(timeout=max(0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None) # Finish this batch, stop on the next loop
+                    break
+                batch.append(request)
+
+            self.slots.acquire()
+            now = time.perf_counter()
+            for request in batch:
+                request.dispatched = now
+            self.stats.dispatched(len(batch))
+            future = self.executor.submit(_solve_batch, [(request.puzzle, request.mode) for request in batch])
+            future.add_done_callback(lambda future, batch=batch: self.finish(batch, future))
+
+    def finish(self, batch, future):
+        self.slots.release()
+        try:
+            records = future.result()
+        except Exception as e: # The worker process died or the batch couldn't be sent to it
+            records = [{'game': request.puzzle.game, 'status': 'error', 'error': repr(e)} for request in batch]
+
+        for request, record in zip(batch, records):
+            record['latency'] = time.perf_counter() - request.arrived
+            request.record = record
+            self.stats.answered(request)
+            request.done.set()
+
+    def close(self):
+        self.queue.put(None)
+        self.dispatcher.join()
+        self.executor.shutdown()
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, clients reuse one connection
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.reply(200, self.server.service.stats.as_dict())
+        else:
+            self.reply(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/solve':
+            self.reply(404, {'error': f'Unknown path {self.path}'})
+            return
+
+        # Where the body ends is unknown after a bad length, so the connection can't be reused
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.server.service.stats.rejected()
+            self.reply(400, {'error': 'Content-Length must be a number of bytes'})
+            return
+        if length > MAX_BODY:
+            self.close_connection = True
+            self.reply(413, {'error': f'Requests are limited to {MAX_BODY} bytes'})
+            return
+
+        service = self.server.service
+        try:
+            data = json.loads(self.rfile.read(length))
+            many = isinstance(data, list)
+            parsed = [parse_request(item) for item in (data if many else [data])]
+        except ValueError as e: # Includes JSON errors
+            service.stats.rejected()
+            self.reply(400, {'error': str(e)})
+            return
+
+        requests = [service.submit(puzzle, mode) for puzzle, mode in parsed]
+        records = []
+        for item, request in zip(data if many else [data], requests):
+            request.done.wait()
+            if 'id' in item:
+                request.record['id'] = item['id']
+            records.append(request.record)
+        self.reply(200, records if many else records[0])
+
+    def reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass # One line per request would cost more than the solve
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        request, _ = super().get_request()
+        return request, ('local', 0)
+
+def make_server(service, host='127.0.0.1', port=8765, unix_socket=None):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = UnixHTTPServer(unix_socket, Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class ServiceClient:
+    # Keeps one connection open, so a call costs a round trip and the solve
+    def __init__(self, host='127.0.0.1', port=8765, unix_socket=None, timeout=60):
+        if unix_socket:
+            self.connection = UnixHTTPConnection(unix_socket, timeout)
+        else:
+            self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, body=None):
+        data = None if body is None else json.dumps(body).encode()
+        headers = {} if data is None else {'Content-Type': 'application/json'}
+        self.connection.request(method, path, data, headers)
+        response = self.connection.getresponse()
+        result = json.loads(response.read())
+        if response.status != 200:
+            raise ValueError(result.get('error', f'HTTP {response.status}'))
+        return result
+
+    def solve(self, game, text, mode='unique'):
+        return self.request('POST', '/solve', {'game': game, 'puzzle': text, 'mode': mode})
+
+    def solve_many(self, puzzles):
+        # puzzles are request objects, see the top of this module
+        return self.request('POST', '/solve', list(puzzles))
+
+    def stats(self):
+        return self.request('GET', '/stats')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main(argv=None):
+    from solver.batch import iter_paths
+
+    parser = argparse.ArgumentParser(prog='python -m solver.service', description='Serve the solver over HTTP on localhost or a Unix socket')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', help='Listen on (or connect to) this Unix socket instead of TCP')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Run the service until interrupted')
+    serve.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    serve.add_argument('--batch-size', type=int, default=16, help='Most puzzles sent to a worker at once')
+    serve.add_argument('--batch-wait', type=float, default=2, help='Milliseconds to wait for more puzzles to batch')
+    serve.add_argument('--cache-mb', type=float, default=16, help='Result cache of each worker, 0 to disable')
+
+    solve = commands.add_parser('solve', help='Send puzzle files to a running service and print one JSON line each')
+    solve.add_argument('game', choices=sorted(LOADERS))
+    solve.add_argument('paths', nargs='+', help='Files, directories or glob patterns, e.g. "configs/queens/*"')
+    solve.add_argument('--mode', choices=MODES, default='unique')
+
+    commands.add_parser('stats', help='Print the stats of a running service')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        service = SolverService(args.workers, args.batch_size, args.batch_wait / 1000, int(args.cache_mb * 1024 * 1024))
+        server = make_server(service, args.host, args.port, args.socket)
+        print(f'Serving on {args.socket or f"http://{args.host}:{args.port}"} with {service.workers} workers', file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+            if args.socket:
+                os.unlink(args.socket)
+        return 0
+
+    with ServiceClient(args.host, args.port, args.socket) as client:
+        if args.command == 'stats':
+            print(json.dumps(client.stats(), indent=2))
+            return 0
+
+        failed = 0
+        for path in iter_paths(args.paths):
+            with open(path, 'r') as f:
+                record = client.solve(args.game, f.read(), args.mode)
+            record['path'] = path
+            print(json.dumps(record))
+            failed += record['status'] == 'error'
+        return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
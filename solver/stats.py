@@ -0,0 +1,88 @@
+import time
+from contextlib import contextmanager
+
+class Stats:
+    # Counters, phase timings and event hooks of a solve. Clones share the Stats of the grid they come from
+    EVENTS = ('prune', 'branch', 'backtrack')
+
+    def __init__(self):
+        self.hooks = {} # Event name -> callbacks, empty unless someone subscribed
+        self.reset()
+
+    def reset(self):
+        self.rounds = 0 # Propagation runs (worklist drains or full sweeps)
+        self.updates = 0 # Cell.update calls
+        self.checks = 0 # State.is_possible calls
+        self.checks_by_rule = {} # State class name -> is_possible calls
+        self.pruned = 0 # States removed from a superposition
+        self.probes = 0 # States tried by the lookahead
+        self.branches = 0 # States tried by the search
+        self.contradictions = 0 # Probes and branches that ended in a contradiction
+        self.clones = 0 # Grid.clone calls
+        self.phases = {} # Phase name -> seconds, nested phases are also counted in their parent
+
+    def subscribe(self, event, callback):
+        # prune: callback(grid, x, y, removed_states, rule)
+        # branch: callback(grid, x, y, state)
+        # backtrack: callback(grid, x, y, state, contradiction)
+        if event not in self.EVENTS:
+            raise ValueError(f'Unknown event {event!r}')
+        self.hooks.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event, callback):
+        self.hooks[event].remove(callback)
+        if not self.hooks[event]:
+            del self.hooks[event]
+
+    def emit(self, event, *args):
+        # Callers check `if stats.hooks` first so a solve without subscribers doesn't pay for the call
+        for callback in self.hooks.get(event, ()):
+            callback(*args)
+
+    def merge(self, other):
+        # Adds the counters and timings of a solve run on a grid with its own Stats, e.g. in another thread or process.
+        # Takes a Stats or its as_dict()
+        counts = other if isinstance(other, dict) else other.as_dict()
+        for name in ('rounds', 'updates', 'checks', 'pruned', 'probes', 'branches', 'contradictions', 'clones'):
+            setattr(self, name, getattr(self, name) + counts[name])
+        for rule, count in counts['checks_by_rule'].items():
+            self.checks_by_rule[rule] = self.checks_by_rule.get(rule, 0) + count
+        for name, seconds in counts['phases'].items():
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def as_dict(self):
+        return {
+            'rounds': self.rounds,
+            'updates': self.updates,
+            'checks': self.checks,
+            'checks_by_rule': dict(self.checks_by_rule),
+            'pruned': self.pruned,
+            'probes': self.probes,
+            'branches': self.branches,
+            'contradictions': self.contradictions,
+            'clones': self.clones,
+            'phases': dict(self.phases),
+        }
+
+    def lines(self):
+        # Short human readable lines, used by the CLI and the pygame overlays
+        lines = [
+            f'rounds {self.rounds}  updates {self.updates}',
+            f'checks {self.checks}  pruned {self.pruned}',
+        ]
+        lines += [f'  {rule} {count}' for rule, count in sorted(self.checks_by_rule.items())]
+        lines.append(f'probes {self.probes}  branches {self.branches}')
+        lines.append(f'contradictions {self.contradictions}  clones {self.clones}')
+        lines += [f'{name} {seconds * 1000:.1f} ms' for name, seconds in sorted(self.phases.items())]
+        return lines
+
+    def __str__(self):
+        return '\n'.join(self.lines())
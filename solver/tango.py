@@ -0,0 +1,376 @@
+from array import array
+from functools import lru_cache
+
+from solver.grid import Grid, State
+
+class TangoState(State):
+    def __init__(self, name, char, other_name):
+        super().__init__(name, char)
+        self.other_name = other_name
+
+    def is_possible(self, grid, cell_x, cell_y):
+        in_row = grid.must_be(cell_x - 1, cell_y, self.name) and grid.must_be(cell_x + 1, cell_y, self.name)
+        in_row = in_row or grid.must_be(cell_x - 2, cell_y, self.name) and grid.must_be(cell_x - 1, cell_y, self.name)
+        in_row = in_row or grid.must_be(cell_x + 1, cell_y, self.name) and grid.must_be(cell_x + 2, cell_y, self.name)
+        in_col = grid.must_be(cell_x, cell_y - 1, self.name) and grid.must_be(cell_x, cell_y + 1, self.name)
+        in_col = in_col or grid.must_be(cell_x, cell_y - 2, self.name) and grid.must_be(cell_x, cell_y - 1, self.name)
+        in_col = in_col or grid.must_be(cell_x, cell_y + 1, self.name) and grid.must_be(cell_x, cell_y + 2, self.name)
+
+        # Count the number of times this state appears and the number of times the other state appears in the row and column
+        if grid.compact:
+            # Same counts on the masks, without making cell views
+            bit = grid.state_bits[self.name]
+            domains = grid.domains
+            width = grid.width
+            row = cell_y * width
+            min_row_count = 0
+            for x in range(width):
+                if x != cell_x and domains[row + x] == bit:
+                    min_row_count += 1
+            if min_row_count >= grid.width // 2:
+                return False
+
+            min_col_count = 0
+            for y in range(grid.height):
+                if y != cell_y and domains[y * width + cell_x] == bit:
+                    min_col_count += 1
+            if min_col_count >= grid.height // 2:
+                return False
+        else:
+            min_row_count = 0
+            for cell in grid.iter_row(cell_y):
+                if cell != grid.cells[cell_x][cell_y] and cell.must_be(self.name):
+                    min_row_count += 1
+            if min_row_count >= grid.width // 2:
+                return False
+
+            min_col_count = 0
+            for cell in grid.iter_col(cell_x):
+                if cell != grid.cells[cell_x][cell_y] and cell.must_be(self.name):
+                    min_col_count += 1
+            if min_col_count >= grid.height // 2:
+                return False
+
+        # Check equality constraints
+        for x, y in grid.equal_partners.get((cell_x, cell_y), ()):
+            if grid.must_be(x, y, self.other_name):
+                return False
+
+        # Check opposite constraints
+        for x, y in grid.opposite_partners.get((cell_x, cell_y), ()):
+            if grid.must_be(x, y, self.name):
+                return False
+
+        return not in_row and not in_col
+
+SUN = TangoState("SUN", "S", "MOON")
+MOON = TangoState("MOON", "M", "SUN")
+
+class TangoGrid(Grid):
+    def __init__(self, width, height, compact=False):
+        super().__init__(width, height, (200, 200, 200), [SUN, MOON], compact)
+        self.clear_constraints()
+
+    def peers(self, x, y):
+        # Rules read the whole row and column plus the cells linked by a constraint
+        for other_x in range(self.width):
+            if other_x != x:
+                yield other_x, y
+
+        for other_y in range(self.height):
+            if other_y != y:
+                yield x, other_y
+
+        yield from self.equal_partners.get((x, y), ())
+        yield from self.opposite_partners.get((x, y), ())
+
+    def infer(self):
+        # Deductions the per-cell rules can't make: chains of constraints and whole-line patterns
+        groups = self.constraint_groups()
+        if groups.conflict is not None:
+            self.prune(*groups.conflict, [], 'constraint chain')
+            return None
+
+        changed = []
+
+        # Cells linked by a chain of = and x constraints are fixed together as soon as one of them is
+        for members in groups.groups:
+            sun_parity = None # Parity of the cells that hold a sun
+            for (x, y), parity in members:
+                if self.must_be(x, y, SUN.name):
+                    value = parity
+                elif self.must_be(x, y, MOON.name):
+                    value = parity ^ 1
+                else:
+                    continue
+
+                if sun_parity is None:
+                    sun_parity = value
+                elif value != sun_parity:
+                    self.prune(x, y, [], 'constraint chain')
+                    return None
+
+            if sun_parity is None:
+                continue
+
+            for (x, y), parity in members:
+                if len(self.states_at(x, y)) > 1:
+                    self.prune(x, y, [SUN if parity == sun_parity else MOON], 'constraint chain')
+                    changed.append((x, y))
+
+        # Cells that are the same in every way left to fill their row or column
+        for y in range(self.height):
+            if not self.infer_line([(x, y) for x in range(self.width)], groups.row_links[y], changed):
+                return None
+        for x in range(self.width):
+            if not self.infer_line([(x, y) for y in range(self.height)], groups.col_links[x], changed):
+                return None
+
+        return changed
+
+    def infer_line(self, cells, links, changed):
+        suns = 0
+        moons = 0
+        for i, (x, y) in enumerate(cells):
+            if self.must_be(x, y, SUN.name):
+                suns |= 1 << i
+            elif self.must_be(x, y, MOON.name):
+                moons |= 1 << i
+
+        forced = line_forced(len(cells), suns, moons, links)
+        if forced is None:
+            self.prune(*cells[0], [], 'line pattern')
+            return False
+
+        always_sun, always_moon = forced
+        for i, (x, y) in enumerate(cells):
+            if len(self.states_at(x, y)) < 2:
+                continue
+            if always_sun & (1 << i):
+                self.prune(x, y, [SUN], 'line pattern')
+                changed.append((x, y))
+            elif always_moon & (1 << i):
+                self.prune(x, y, [MOON], 'line pattern')
+                changed.append((x, y))
+
+        return True
+
+    def constraint_groups(self):
+        # Rebuilt only when the constraint lists were replaced
+        if self.groups is None or self.groups.equals is not self.equals or self.groups.opposites is not self.opposites:
+            self.groups = ConstraintGroups(self.width, self.height, self.equals, self.opposites)
+        return self.groups
+
+    def branch_priority(self, x, y):
+        # Cells in the most filled-in row or column first
+        undecided_row = sum(1 for other_x in range(self.width) if len(self.states_at(other_x, y)) > 1)
+        undecided_col = sum(1 for other_y in range(self.height) if len(self.states_at(x, other_y)) > 1)
+        return min(undecided_row, undecided_col)
+
+    def snapshot_extra(self):
+        return tuple(self.equals), tuple(self.opposites)
+
+    def key_extra(self):
+        # Constraints as sorted (kind, cell, cell) index triples, so the order they were added in doesn't matter
+        triples = set()
+        for kind, constraints in enumerate((self.equals, self.opposites)):
+            for (x1, y1), (x2, y2) in constraints:
+                a = y1 * self.width + x1
+                b = y2 * self.width + x2
+                triples.add((kind, min(a, b), max(a, b)))
+        return array('H', [value for triple in sorted(triples) for value in triple]).tobytes()
+
+    def load_snapshot_extra(self, extra):
+        equals, opposites = extra
+        for cell_a, cell_b in equals:
+            self.add_equal(cell_a, cell_b)
+        for cell_a, cell_b in opposites:
+            self.add_opposite(cell_a, cell_b)
+
+    # The constraint lists and partner indexes are shared with clones, so they are
+    # replaced rather than modified in place when a constraint is added
+    def add_equal(self, cell_a, cell_b):
+        self.equals = self.equals + [(cell_a, cell_b)]
+        self.equal_partners = with_partners(self.equal_partners, cell_a, cell_b)
+
+    def add_opposite(self, cell_a, cell_b):
+        self.opposites = self.opposites + [(cell_a, cell_b)]
+        self.opposite_partners = with_partners(self.opposite_partners, cell_a, cell_b)
+
+    def clear_constraints(self):
+        self.equals = [] # ((x1, y1), (x2, y2)) pairs of cells that must be the same
+        self.opposites = [] # ((x1, y1), (x2, y2)) pairs of cells that must be different
+        self.equal_partners = {} # (x, y) -> cells that must be the same as (x, y)
+        self.opposite_partners = {} # (x, y) -> cells that must be different from (x, y)
+        self.groups = None # ConstraintGroups of the lists above, built when first needed
+
+    def clone(self):
+        copy = TangoGrid(self.width, self.height, self.compact)
+        copy.equals = self.equals
+        copy.opposites = self.opposites
+        copy.equal_partners = self.equal_partners
+        copy.opposite_partners = self.opposite_partners
+        copy.groups = self.groups
+
+        copy.is_original = False
+        copy.stats = self.stats
+        copy.stats.clones += 1
+        copy.cache = self.cache
+
+        self.copy_states_to(copy)
+
+        return copy
+
+class ConstraintGroups:
+    # Union-find with parity over the = (same parity) and x (opposite parity) constraints
+    def __init__(self, width, height, equals, opposites):
+        self.equals = equals
+        self.opposites = opposites
+        self.conflict = None # A cell of a constraint cycle that can't be satisfied
+
+        self.parent = {}
+        self.parity = {} # Parity relative to the parent
+        for constraints, relation in ((equals, 0), (opposites, 1)):
+            for cell_a, cell_b in constraints:
+                if not self.union(cell_a, cell_b, relation) and self.conflict is None:
+                    self.conflict = cell_a
+
+        members = {}
+        for cell in self.parent:
+            root, parity = self.find(cell)
+            members.setdefault(root, []).append((cell, parity))
+        self.groups = [group for group in members.values() if len(group) > 1] # [((x, y), parity)] per chain
+
+        # Links between cells of the same chain within a row or column, as (i, j, parity) line indices
+        self.row_links = [line_links([(x, members_parity) for (x, cell_y), members_parity in group if cell_y == y] for group in self.groups) for y in range(height)]
+        self.col_links = [line_links([(y, members_parity) for (cell_x, y), members_parity in group if cell_x == x] for group in self.groups) for x in range(width)]
+
+    def find(self, cell):
+        parent = self.parent.setdefault(cell, cell)
+        if parent == cell:
+            self.parity.setdefault(cell, 0)
+            return cell, 0
+
+        root, parity = self.find(parent)
+        self.parent[cell] = root
+        self.parity[cell] ^= parity
+        return root, self.parity[cell]
+
+    def union(self, cell_a, cell_b, relation):
+        # False if the cells are already linked with the other relation
+        root_a, parity_a = self.find(cell_a)
+        root_b, parity_b = self.find(cell_b)
+        if root_a == root_b:
+            return parity_a ^ parity_b == relation
+
+        self.parent[root_b] = root_a
+        self.parity[root_b] = parity_a ^ parity_b ^ relation
+        return True
+
+def line_links(chains):
+    links = []
+    for chain in chains:
+        for index, parity in chain[1:]:
+            links.append((chain[0][0], index, chain[0][1] ^ parity))
+    return tuple(links)
+
+@lru_cache(maxsize=None)
+def line_patterns(length):
+    # Every way to fill a line, as bitmasks with a bit set for each sun: at most half suns and half moons,
+    # never three of the same in a row
+    full = (1 << length) - 1
+    half = length // 2
+    patterns = []
+    for pattern in range(1 << length):
+        suns = bin(pattern).count('1')
+        if suns > half or length - suns > half:
+            continue
+
+        moons = full & ~pattern
+        if pattern & (pattern >> 1) & (pattern >> 2) or moons & (moons >> 1) & (moons >> 2):
+            continue
+
+        patterns.append(pattern)
+    return tuple(patterns)
+
+@lru_cache(maxsize=65536)
+def line_forced(length, suns, moons, links):
+    # (always_sun, always_moon) bitmasks of the cells that hold the same state in every filling that agrees with
+    # the fixed cells and the links, or None if there is no such filling
+    full = (1 << length) - 1
+    always_sun = full
+    ever_sun = 0
+    found = False
+    for pattern in line_patterns(length):
+        if pattern & moons or pattern & suns != suns:
+            continue
+        if any(((pattern >> i) ^ (pattern >> j)) & 1 != parity for i, j, parity in links):
+            continue
+
+        always_sun &= pattern
+        ever_sun |= pattern
+        found = True
+
+    if not found:
+        return None
+    return always_sun, full & ~ever_sun
+
+def with_partners(index, cell_a, cell_b):
+    index = dict(index)
+    index[cell_a] = index.get(cell_a, ()) + (cell_b,)
+    index[cell_b] = index.get(cell_b, ()) + (cell_a,)
+    return index
+
+# Text format: one line per row of '.', 'S' or 'M' tokens, followed by
+# constraint lines of the form "= x1 y1 x2 y2" (same) or "x x1 y1 x2 y2" (opposite)
+def read_tango(text):
+    # Rows of tokens and the (cell_a, cell_b) pairs of each kind, checked but not turned into a grid yet
+    rows = []
+    equals = []
+    opposites = []
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+
+        if tokens[0] in ('=', 'x'):
+            if len(tokens) != 5:
+                raise ValueError(f'Expected "{tokens[0]} x1 y1 x2 y2", got {line.strip()!r}')
+            x1, y1, x2, y2 = (int(t) for t in tokens[1:5])
+            (equals if tokens[0] == '=' else opposites).append(((x1, y1), (x2, y2)))
+        else:
+            for token in tokens:
+                if token not in ('.', SUN.char, MOON.char):
+                    raise ValueError(f'Unknown cell {token!r}, expected ".", "{SUN.char}" or "{MOON.char}"')
+            rows.append(tokens)
+
+    if not rows or any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError('Rows must all have the same length')
+    width, height = len(rows[0]), len(rows)
+    for (x1, y1), (x2, y2) in equals + opposites:
+        if not (0 <= x1 < width and 0 <= y1 < height and 0 <= x2 < width and 0 <= y2 < height):
+            raise ValueError(f'Constraint ({x1}, {y1}) ({x2}, {y2}) is off the {width}x{height} board')
+        if abs(x1 - x2) + abs(y1 - y2) != 1:
+            raise ValueError(f'Constraint ({x1}, {y1}) ({x2}, {y2}) is not between neighbouring cells')
+    return rows, equals, opposites
+
+def parse_tango(text, compact=False):
+    rows, equals, opposites = read_tango(text)
+    grid = TangoGrid(len(rows[0]), len(rows), compact)
+    for y, row in enumerate(rows):
+        for x, token in enumerate(row):
+            if token == SUN.char:
+                grid.set_states(x, y, [SUN])
+            elif token == MOON.char:
+                grid.set_states(x, y, [MOON])
+
+    for cell_a, cell_b in equals:
+        grid.add_equal(cell_a, cell_b)
+    for cell_a, cell_b in opposites:
+        grid.add_opposite(cell_a, cell_b)
+
+    return grid
+
+def load_tango(path, compact=False):
+    with open(path, 'r') as f:
+        return parse_tango(f.read(), compact)
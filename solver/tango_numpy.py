@@ -0,0 +1,184 @@
+try:
+    import numpy as np
+except ImportError: # NumPy is only needed for the vectorized propagator
+    np = None
+
+from solver.tango import SUN, MOON
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('The vectorized Tango propagator needs numpy (pip install numpy)')
+
+class _Pairs:
+    # Constraint pairs of every board, stored in both directions and sorted by board
+    def __init__(self, boards, a, c, board_count):
+        order = np.argsort(boards, kind='stable')
+        self.a = a[order]
+        self.c = c[order]
+        self.counts = np.bincount(boards, minlength=board_count)
+        self.offsets = np.cumsum(self.counts) - self.counts
+
+    @classmethod
+    def from_grids(cls, grids, attr):
+        boards, a, c = [], [], []
+        for b, grid in enumerate(grids):
+            for (x1, y1), (x2, y2) in getattr(grid, attr):
+                i1 = y1 * grid.width + x1
+                i2 = y2 * grid.width + x2
+                boards += [b, b]
+                a += [i1, i2]
+                c += [i2, i1]
+
+        return cls(np.array(boards, dtype=np.intp), np.array(a, dtype=np.intp), np.array(c, dtype=np.intp), len(grids))
+
+    def flat(self, board_map, cell_count):
+        # Flat indices of (cell, partner) for boards that are copies of board_map[i]
+        counts = self.counts[board_map]
+        total = counts.sum()
+        new_boards = np.repeat(np.arange(len(board_map)), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        src = np.repeat(self.offsets[board_map], counts) + within
+        return new_boards * cell_count + self.a[src], new_boards * cell_count + self.c[src]
+
+def _impossible(fixed, other_fixed, equals, opposites):
+    # Cells where the state whose "must be" mask is fixed cannot go
+    height, width = fixed.shape[1:]
+
+    # No three in a row
+    padded = np.pad(fixed, ((0, 0), (0, 0), (2, 2)))
+    l2, l1, r1, r2 = padded[:, :, 0:width], padded[:, :, 1:width + 1], padded[:, :, 3:width + 3], padded[:, :, 4:width + 4]
+    bad = (l1 & r1) | (l2 & l1) | (r1 & r2)
+
+    padded = np.pad(fixed, ((0, 0), (2, 2), (0, 0)))
+    u2, u1, d1, d2 = padded[:, 0:height], padded[:, 1:height + 1], padded[:, 3:height + 3], padded[:, 4:height + 4]
+    bad |= (u1 & d1) | (u2 & u1) | (d1 & d2)
+
+    # At most half of a row or column
+    counts = fixed.astype(np.int16)
+    bad |= counts.sum(axis=2, keepdims=True) - counts >= width // 2
+    bad |= counts.sum(axis=1, keepdims=True) - counts >= height // 2
+
+    # Constraint partners that are already fixed
+    flat = bad.reshape(-1)
+    eq_a, eq_c = equals
+    flat[eq_a[other_fixed.reshape(-1)[eq_c]]] = True
+    op_a, op_c = opposites
+    flat[op_a[fixed.reshape(-1)[op_c]]] = True
+
+    return bad
+
+def _propagate(can_sun, can_moon, equals, opposites):
+    rounds = 0
+    while True:
+        rounds += 1
+        sun_fixed = can_sun & ~can_moon
+        moon_fixed = can_moon & ~can_sun
+
+        new_sun = can_sun & ~_impossible(sun_fixed, moon_fixed, equals, opposites)
+        new_moon = can_moon & ~_impossible(moon_fixed, sun_fixed, equals, opposites)
+
+        if np.array_equal(new_sun, can_sun) and np.array_equal(new_moon, can_moon):
+            return rounds
+
+        can_sun[...] = new_sun
+        can_moon[...] = new_moon
+
+class TangoBoards:
+    # A batch of same-sized Tango boards stored as "can be SUN" / "can be MOON" masks of shape (boards, height, width)
+    def __init__(self, grids):
+        _require_numpy()
+
+        self.width = grids[0].width
+        self.height = grids[0].height
+        self.can_sun = np.zeros((len(grids), self.height, self.width), dtype=bool)
+        self.can_moon = np.zeros((len(grids), self.height, self.width), dtype=bool)
+
+        for b, grid in enumerate(grids):
+            if (grid.width, grid.height) != (self.width, self.height):
+                raise ValueError('All boards of a batch must have the same size')
+
+            for x, y in grid.iter_cell_coords():
+                self.can_sun[b, y, x] = grid.can_be(x, y, SUN.name)
+                self.can_moon[b, y, x] = grid.can_be(x, y, MOON.name)
+
+        self.equals = _Pairs.from_grids(grids, 'equals')
+        self.opposites = _Pairs.from_grids(grids, 'opposites')
+
+        self.rounds = 0
+        self.probes = 0
+
+    def _flat_pairs(self, board_map):
+        cell_count = self.width * self.height
+        return self.equals.flat(board_map, cell_count), self.opposites.flat(board_map, cell_count)
+
+    def contradictions(self):
+        return (~(self.can_sun | self.can_moon)).any(axis=(1, 2))
+
+    def solved(self):
+        return (self.can_sun ^ self.can_moon).all(axis=(1, 2))
+
+    def propagate(self):
+        equals, opposites = self._flat_pairs(np.arange(len(self.can_sun)))
+        self.rounds += _propagate(self.can_sun, self.can_moon, equals, opposites)
+
+    def probe(self):
+        # Try both states of every undecided cell of every board at once and drop the ones that lead to a contradiction
+        active = ~self.solved() & ~self.contradictions()
+        boards, ys, xs = np.nonzero(self.can_sun & self.can_moon & active[:, None, None])
+        if len(boards) == 0:
+            return False
+
+        count = len(boards)
+        self.probes += 2 * count
+        probe_boards = np.concatenate([boards, boards])
+        probe_ys = np.concatenate([ys, ys])
+        probe_xs = np.concatenate([xs, xs])
+        is_sun = np.arange(2 * count) < count
+
+        can_sun = self.can_sun[probe_boards]
+        can_moon = self.can_moon[probe_boards]
+        can_sun[np.arange(2 * count), probe_ys, probe_xs] = is_sun
+        can_moon[np.arange(2 * count), probe_ys, probe_xs] = ~is_sun
+
+        equals, opposites = self._flat_pairs(probe_boards)
+        self.rounds += _propagate(can_sun, can_moon, equals, opposites)
+
+        dead = (~(can_sun | can_moon)).any(axis=(1, 2))
+        sun_dead = dead[:count]
+        moon_dead = dead[count:]
+        self.can_sun[boards[sun_dead], ys[sun_dead], xs[sun_dead]] = False
+        self.can_moon[boards[moon_dead], ys[moon_dead], xs[moon_dead]] = False
+
+        return bool(dead.any())
+
+    def solve(self):
+        self.propagate()
+        while self.probe():
+            self.propagate()
+
+    def apply_to(self, grids):
+        for b, grid in enumerate(grids):
+            for x, y in grid.iter_cell_coords():
+                states = []
+                if self.can_sun[b, y, x]:
+                    states.append(SUN)
+                if self.can_moon[b, y, x]:
+                    states.append(MOON)
+                grid.set_states(x, y, states)
+
+def solve_tango_boards(grids):
+    # Grids of different sizes are batched separately, boards the vectorized probing can't finish use the regular lookahead
+    by_size = {}
+    for grid in grids:
+        by_size.setdefault((grid.width, grid.height), []).append(grid)
+
+    for batch in by_size.values():
+        boards = TangoBoards(batch)
+        boards.solve()
+        boards.apply_to(batch)
+
+    for grid in grids:
+        if not grid.is_solved() and not grid.has_contradiction():
+            grid.update_superpositions()
+
+    return grids
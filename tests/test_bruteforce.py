@@ -0,0 +1,137 @@
+import itertools
+
+import pytest
+
+from solver.dlx import search_queens_dlx
+from solver.generate import balanced_lines, parse_queens, random_queens, random_tango
+from solver.queens import CROWN
+from solver.tango import MOON, SUN
+
+# Small random boards, solved by plain enumeration and by each engine
+
+def brute_queens(grid):
+    # Every permutation of columns, kept if the queens don't touch and each region has one
+    n = grid.width
+    solutions = set()
+    for columns in itertools.permutations(range(n)):
+        if any(abs(columns[y] - columns[y + 1]) <= 1 for y in range(n - 1)):
+            continue
+        if len({grid.region_ids[x][y] for y, x in enumerate(columns)}) != len(grid.region_cells):
+            continue
+        solutions.add(frozenset((x, y) for y, x in enumerate(columns)))
+    return solutions
+
+def brute_tango(grid):
+    # Rows picked among the balanced lines, checking the givens, the columns and the =/x constraints
+    n = grid.width
+    rows = [[SUN.name if sun else MOON.name for sun in line] for line in balanced_lines(n)]
+    solutions = set()
+
+    def allowed(y, row):
+        return all(grid.can_be(x, y, row[x]) for x in range(n))
+
+    def column_ok(board, x):
+        column = [row[x] for row in board]
+        if column.count(SUN.name) > n // 2 or column.count(MOON.name) > n // 2:
+            return False
+        return not any(column[i] == column[i + 1] == column[i + 2] for i in range(len(column) - 2))
+
+    def pairs_ok(board):
+        for partners, same in ((grid.equal_partners, True), (grid.opposite_partners, False)):
+            for (x, y), others in partners.items():
+                for other_x, other_y in others:
+                    if (board[y][x] == board[other_y][other_x]) != same:
+                        return False
+        return True
+
+    def place(board):
+        if len(board) == n:
+            if pairs_ok(board):
+                solutions.add(frozenset(((x, y), board[y][x]) for y in range(n) for x in range(n)))
+            return
+        for row in rows:
+            if allowed(len(board), row) and all(column_ok(board + [row], x) for x in range(n)):
+                place(board + [row])
+
+    place([])
+    return solutions
+
+def queens_of(grid):
+    return frozenset((x, y) for x, y in grid.iter_cell_coords() if grid.must_be(x, y, CROWN.name))
+
+def tango_of(grid):
+    return frozenset(((x, y), grid.states_at(x, y)[0].name) for x, y in grid.iter_cell_coords())
+
+QUEENS_BOARDS = [(n, seed) for n in range(4, 8) for seed in range(5)]
+TANGO_BOARDS = [(n, seed) for n in (4, 6) for seed in range(5)]
+
+def check_lookahead(grid, solutions, solution_of):
+    # The lookahead only removes states no solution uses, and if it collapses the board that is the only solution
+    grid.update_superpositions(3)
+    for solution in solutions:
+        for cell, name in solution:
+            assert grid.can_be(*cell, name)
+    if grid.is_solved():
+        assert {solution_of(grid)} == solutions
+
+def queens_cells(solution, grid):
+    # Queens solutions as (cell, state name) pairs, to check them like Tango ones
+    return frozenset(((x, y), CROWN.name if (x, y) in solution else 'EMPTY') for x, y in grid.iter_cell_coords())
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('n, seed', QUEENS_BOARDS)
+def test_queens_search(n, seed, compact):
+    expected = brute_queens(random_queens(n, seed))
+    result = random_queens(n, seed, compact).search(100)
+    assert result.exhausted
+    assert {queens_of(solution) for solution in result.solutions} == expected
+
+@pytest.mark.parametrize('n, seed', QUEENS_BOARDS)
+def test_queens_dlx(n, seed):
+    expected = brute_queens(random_queens(n, seed))
+    result = search_queens_dlx(random_queens(n, seed), 100)
+    assert result.exhausted
+    assert {queens_of(solution) for solution in result.solutions} == expected
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('n, seed', QUEENS_BOARDS)
+def test_queens_lookahead(n, seed, compact):
+    grid = random_queens(n, seed, compact)
+    expected = {queens_cells(solution, grid) for solution in brute_queens(grid)}
+    check_lookahead(grid, expected, lambda grid: queens_cells(queens_of(grid), grid))
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('n, seed', TANGO_BOARDS)
+def test_tango_search(n, seed, compact):
+    expected = brute_tango(random_tango(n, seed))
+    result = random_tango(n, seed, compact=compact).search(100)
+    assert result.exhausted
+    assert {tango_of(solution) for solution in result.solutions} == expected
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('n, seed', TANGO_BOARDS)
+def test_tango_lookahead(n, seed, compact):
+    grid = random_tango(n, seed, compact=compact)
+    check_lookahead(grid, brute_tango(grid), tango_of)
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('make', [lambda compact: random_queens(6, 1, compact), lambda compact: random_tango(6, 1, compact=compact)],
+                         ids=['queens', 'tango'])
+def test_empty_cell_has_no_solution(make, compact):
+    # A cell emptied before the search starts is a contradiction, not a cell with nothing left to branch on
+    grid = make(compact)
+    grid.set_states(2, 3, [])
+    assert not grid.propagate()
+    result = grid.search(2)
+    assert result.status == 'none'
+    assert result.solutions == []
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_queens_matching_contradiction(compact):
+    # Regions 0 and 2 only have the bottom row between them: the contradiction is reported on their cells
+    grid = parse_queens('3 3 3 3 3\n4 4 4 4 4\n4 4 4 4 4\n1 1 1 1 1\n0 0 1 2 2\n', compact=compact)
+    deductions = list(grid.clone().deductions())
+    assert {(deduction.x, deduction.y) for deduction in deductions} == {(0, 4), (1, 4), (3, 4), (4, 4)}
+    assert all(deduction.rule == 'matching' for deduction in deductions)
+    assert not grid.propagate()
+    assert grid.has_contradiction()
@@ -0,0 +1,63 @@
+import glob
+import os
+
+import pytest
+
+from solver.generate import random_queens, random_tango
+from solver.pack import Puzzle, PuzzlePack, main, write_pack
+
+# Packs written and read back: same text, same grids, whatever the board sizes
+
+CONFIGS = os.path.join(os.path.dirname(__file__), '..', 'configs')
+
+def round_trip(tmp_path, game, puzzles):
+    path = str(tmp_path / f'{game}.pack')
+    assert write_pack(path, game, puzzles) == len(puzzles)
+    with PuzzlePack(path) as pack:
+        assert pack.game == game
+        assert len(pack) == len(puzzles)
+        for puzzle, read in zip(puzzles, pack):
+            assert read.to_text() == puzzle.to_text()
+            for compact in (False, True):
+                assert read.to_grid(compact).state_masks() == puzzle.to_grid(compact).state_masks()
+        return pack[-1]
+
+def config_puzzles(game):
+    puzzles = []
+    for path in sorted(glob.glob(os.path.join(CONFIGS, game, '*'))):
+        with open(path) as f:
+            puzzles.append(Puzzle.from_text(game, f.read()))
+    return puzzles
+
+def test_queens_round_trip(tmp_path):
+    puzzles = config_puzzles('queens') + [Puzzle.from_grid(random_queens(n, n)) for n in range(4, 12)]
+    last = round_trip(tmp_path, 'queens', puzzles)
+    assert last.to_grid().region_cells == random_queens(11, 11).region_cells
+
+def test_tango_round_trip(tmp_path):
+    puzzles = config_puzzles('tango') + [Puzzle.from_grid(random_tango(n, n)) for n in (4, 6, 8, 10)]
+    last = round_trip(tmp_path, 'tango', puzzles)
+    original = random_tango(10, 10)
+    assert sorted(last.to_grid().equals) == sorted(original.equals)
+    assert sorted(last.to_grid().opposites) == sorted(original.opposites)
+
+@pytest.mark.parametrize('width, height, cells, constraints', [
+    (2, 2, [0, 1, 2, 256], ()),
+    (2, 2, [0, 1, -1, 0], ()),
+    (256, 1, [0] * 256, ()),
+    (2, 2, [0, 1, 2], ()),
+    (2, 2, [0] * 4, [(0, (0, 0), (2, 0))]),
+])
+def test_out_of_range(width, height, cells, constraints):
+    with pytest.raises(ValueError):
+        Puzzle('tango', width, height, cells, constraints)
+
+def test_build_reports_bad_puzzle(tmp_path, capsys):
+    # Colors 1 to 256, the last one doesn't fit in a byte
+    path = tmp_path / 'colors'
+    path.write_text('\n'.join(' '.join(str(y * 16 + x + 1) for x in range(16)) for y in range(16)) + '\n')
+    output = tmp_path / 'out.pack'
+    with pytest.raises(SystemExit):
+        main(['build', 'queens', str(output), str(path)])
+    assert 'Cannot pack' in capsys.readouterr().err
+    assert not output.exists()
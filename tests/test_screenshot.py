@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+pygame = pytest.importorskip('pygame')
+
+from solver.generate import random_queens_regions, random_tango
+from solver.screenshot import ASSETS, find_grid, import_queens, import_tango
+from solver.tango import SUN
+
+# Boards drawn the way the games show them, with or without the frame around the board, then read back
+
+BACKGROUND = (244, 242, 238)
+REGION_COLORS = [(255, 123, 96), (150, 190, 255), (179, 223, 160), (223, 223, 223), (187, 163, 226), (255, 201, 146),
+                 (230, 243, 136), (185, 178, 158), (223, 160, 191), (163, 210, 216), (98, 239, 234), (255, 147, 243)]
+
+def to_array(surface):
+    width, height = surface.get_size()
+    return np.frombuffer(pygame.image.tobytes(surface, 'RGB'), dtype=np.uint8).reshape(height, width, 3)
+
+def board_surface(n, cell, frame):
+    # Background and the offset of the board. Frameless crops end where the board does
+    margin = 25 if frame else 0
+    surface = pygame.Surface((n * cell + 2 * margin, n * cell + 2 * margin))
+    surface.fill(BACKGROUND)
+    return surface, margin
+
+def draw_frame(surface, n, cell, margin):
+    # Around the board, its inside edges on the board's edges
+    pygame.draw.rect(surface, (20, 20, 20), (margin - 3, margin - 3, n * cell + 6, n * cell + 6), 3)
+
+def render_queens(regions, cell, frame):
+    n = len(regions)
+    surface, margin = board_surface(n, cell, frame)
+    for row in range(n):
+        for column in range(n):
+            pygame.draw.rect(surface, REGION_COLORS[regions[row][column]], (margin + column * cell, margin + row * cell, cell, cell))
+
+    # Thick dark lines between regions, thin grey ones inside them
+    for row in range(n):
+        for column in range(n):
+            x, y = margin + column * cell, margin + row * cell
+            if column + 1 < n:
+                border = regions[row][column] != regions[row][column + 1]
+                pygame.draw.line(surface, (40, 40, 40) if border else (120, 120, 120), (x + cell, y), (x + cell, y + cell), 3 if border else 1)
+            if row + 1 < n:
+                border = regions[row][column] != regions[row + 1][column]
+                pygame.draw.line(surface, (40, 40, 40) if border else (120, 120, 120), (x, y + cell), (x + cell, y + cell), 3 if border else 1)
+
+    if frame:
+        draw_frame(surface, n, cell, margin)
+    return to_array(surface)
+
+def render_tango(grid, cell, frame):
+    n = grid.width
+    surface, margin = board_surface(n, cell, frame)
+    pygame.draw.rect(surface, (255, 255, 255), (margin, margin, n * cell, n * cell))
+    for i in range(1, n):
+        pygame.draw.line(surface, (200, 200, 200), (margin + i * cell, margin), (margin + i * cell, margin + n * cell), 1)
+        pygame.draw.line(surface, (200, 200, 200), (margin, margin + i * cell), (margin + n * cell, margin + i * cell), 1)
+    if frame:
+        draw_frame(surface, n, cell, margin)
+
+    inset = int(cell * 0.1)
+    symbols = {}
+    for name, color in (('sun', (255, 170, 20)), ('moon', (60, 110, 210))):
+        # The assets are paletted, smoothscale needs 32 bits. Tinted like the game draws them
+        image = pygame.image.load(os.path.join(ASSETS, name + '.png'))
+        rgba = pygame.Surface(image.get_size(), pygame.SRCALPHA)
+        rgba.blit(image, (0, 0))
+        symbols[name] = pygame.transform.smoothscale(rgba, (cell - 2 * inset, cell - 2 * inset))
+        symbols[name].fill(color + (0,), special_flags=pygame.BLEND_RGBA_ADD)
+    for x, y in grid.iter_cell_coords():
+        states = grid.states_at(x, y)
+        if len(states) == 1:
+            surface.blit(symbols['sun' if states[0] is SUN else 'moon'], (margin + x * cell + inset, margin + y * cell + inset))
+
+    # '=' and 'x' on a white square over the line between the two cells
+    size = cell // 12
+    for equal, pairs in ((True, grid.equals), (False, grid.opposites)):
+        for (x1, y1), (x2, y2) in pairs:
+            center_x = margin + (x1 + x2 + 1) * cell // 2
+            center_y = margin + (y1 + y2 + 1) * cell // 2
+            pygame.draw.rect(surface, (255, 255, 255), (center_x - size - 2, center_y - size - 2, 2 * size + 5, 2 * size + 5))
+            if equal:
+                ends = [((-size, -size // 2), (size, -size // 2)), ((-size, size // 2), (size, size // 2))]
+            else:
+                ends = [((-size, -size), (size, size)), ((-size, size), (size, -size))]
+            for (x_a, y_a), (x_b, y_b) in ends:
+                pygame.draw.line(surface, (120, 90, 60), (center_x + x_a, center_y + y_a), (center_x + x_b, center_y + y_b), 2)
+    return to_array(surface)
+
+def pairs(grid_pairs):
+    return {tuple(sorted(pair)) for pair in grid_pairs}
+
+@pytest.mark.parametrize('frame', [True, False], ids=['framed', 'frameless'])
+@pytest.mark.parametrize('cell', [40, 72])
+@pytest.mark.parametrize('n', range(5, 12))
+def test_queens_round_trip(n, cell, frame):
+    regions = random_queens_regions(n, n * 100 + cell)
+    image = render_queens(regions, cell, frame)
+    bounds, size = find_grid(image)
+    assert size == n
+
+    grid = import_queens(image)
+    # Same partition of the cells, whatever the region numbers
+    matched = {(regions[y][x], grid.region_ids[x][y]) for x in range(n) for y in range(n)}
+    assert len(grid.region_cells) == n
+    assert len(matched) == n
+
+@pytest.mark.parametrize('frame', [True, False], ids=['framed', 'frameless'])
+@pytest.mark.parametrize('cell', [50, 80])
+@pytest.mark.parametrize('n', [6, 8, 10])
+def test_tango_round_trip(n, cell, frame):
+    original = random_tango(n, n * 100 + cell)
+    grid = import_tango(render_tango(original, cell, frame))
+    assert grid.width == n
+    assert grid.state_masks() == original.state_masks()
+    assert pairs(grid.equals) == pairs(original.equals)
+    assert pairs(grid.opposites) == pairs(original.opposites)
+
+def render_cell_borders(regions, cell):
+    # Like the app's grid view: every cell has its own 1 px border, so the edges of the crop are lines too
+    n = len(regions)
+    surface, margin = board_surface(n, cell, False)
+    for row in range(n):
+        for column in range(n):
+            pygame.draw.rect(surface, REGION_COLORS[regions[row][column]], (column * cell, row * cell, cell, cell))
+            pygame.draw.rect(surface, (100, 100, 100), (column * cell, row * cell, cell, cell), 1)
+    return to_array(surface)
+
+@pytest.mark.parametrize('render', [lambda regions: render_queens(regions, 80, False), lambda regions: render_cell_borders(regions, 80)],
+                         ids=['lines', 'cell-borders'])
+def test_frameless_720px_render(render):
+    # The board fills a 720 px crop, its bottom row included. Bounds are inside the border lines at the edges, if any
+    regions = random_queens_regions(9, 720)
+    image = render(regions)
+    bounds, size = find_grid(image)
+    assert size == 9
+    assert all(abs(bound - edge) <= 1 for bound, edge in zip(bounds, (0, 0, 720, 720)))
+
+    grid = import_queens(image)
+    assert len({(regions[y][x], grid.region_ids[x][y]) for x in range(9) for y in range(9)}) == 9